@@ -1,29 +1,123 @@
-import requests
 import os
+import re
+import json
 import time
+import logging
+import requests
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config.config import Config
-from utils.results_utils import (parse_numeric_value, send_results_summary_to_telegram)
-from utils.file_operations import load_chat_config
+from utils.results_utils import (parse_numeric_value, send_results_summary_to_telegram, TestResult, TestGroup, load_cached_results, save_cached_results, is_final_result)
+from utils.file_operations import load_chat_config, get_chat_dir, write_json_file
+from utils.system import ShutdownSignal
+
+logger = logging.getLogger(__name__)
+
+# C-based parser backend for BeautifulSoup, much faster than the pure-Python "html.parser"
+HTML_PARSER = "lxml"
+
+# Rows of the results table in a submission report ("table.table-report.submission tbody tr")
+RESULTS_ROWS_XPATH = (
+    '(//table[contains(concat(" ", normalize-space(@class), " "), " table-report ")]'
+    '[contains(concat(" ", normalize-space(@class), " "), " submission ")])[1]//tbody//tr'
+)
+
+# Leading group number of a test name, e.g. 12 for "12a"
+TEST_GROUP_PATTERN = re.compile(r"\s*(\d+)")
+
+
+def create_session():
+    """
+    Create a requests session with keep-alive connection pooling.
+    Idempotent requests are retried on transient server errors.
+    """
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session_cookies_path(chat_id):
+    """
+    Get the file storing the OIOIOI session cookies of a given chat ID.
+    """
+    return os.path.join(get_chat_dir(chat_id), "oioioi_session.json")
 
 
 class OioioiAPI:
     def __init__(self, chat_id):
         """
         Initialize OioioiAPI with user-specific credentials based on chat_id.
+        The HTTP session is kept for the lifetime of the object, so connections to the judge are reused.
+        Session cookies of an earlier login are restored from disk, so a restart does not require a new login.
         """
         self.chat_id = chat_id
         self.base_url = Config.OIOIOI_BASE_URL
+        self.session = create_session()
+        self.username = None
+        self.password = None
+        self.logged_in = False
+        # Validators of reports that had no results yet, keyed by (contest_id, submission_id), for conditional polling
+        self.report_validators = {}
+        self.load_credentials()
+        self.load_session_cookies()
 
-        # Load user-specific credentials
-        config = load_chat_config(chat_id)
+    def load_credentials(self):
+        """
+        (Re)load the user-specific credentials, so changes made via /config are picked up.
+        """
+        config = load_chat_config(self.chat_id)
         if not config:
-            raise ValueError(f"No configuration found for chat ID {chat_id}")
+            raise ValueError(f"No configuration found for chat ID {self.chat_id}")
 
-        self.username = config.get("oioioi_username")
-        self.password = config.get("oioioi_password")
+        username = config.get("oioioi_username")
+        password = config.get("oioioi_password")
+        if (username, password) != (self.username, self.password):
+            # The current session belongs to the old credentials
+            self.logged_in = False
+        self.username = username
+        self.password = password
         self.api_keys = config.get("OIOIOI_API_KEYS", {})
-        self.session = requests.Session()
+
+    def load_session_cookies(self):
+        """
+        Restore the session cookies saved by the last login. Whether the session is still valid is
+        only found out by the next request to a page that requires a login.
+        """
+        try:
+            with open(get_session_cookies_path(self.chat_id), "r") as f:
+                session_data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        if session_data.get("username") != self.username:
+            return
+
+        for cookie in session_data["cookies"]:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        self.logged_in = True
+
+    def save_session_cookies(self):
+        """
+        Save the session cookies, so the session can be reused after a restart.
+        """
+        cookies = [
+            {"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path}
+            for cookie in self.session.cookies
+        ]
+        write_json_file(get_session_cookies_path(self.chat_id), {"username": self.username, "cookies": cookies})
+
+    def ensure_logged_in(self):
+        """
+        Log in unless the current session is still logged in.
+        """
+        if not self.logged_in:
+            self.login()
 
     def get_api_key_for_contest(self, contest_id):
         """
@@ -39,18 +133,22 @@ class OioioiAPI:
         """
         Log in to OIOIOI using the navbar login form.
         Fetches the CSRF token from the main page and performs the login.
+        The resulting session cookies are saved to disk.
         """
+        self.logged_in = False
         main_page_url = f"{self.base_url}/"
         login_url = f"{self.base_url}/login/"
-        self.session = requests.Session()
+
+        # Start from a clean cookie jar but keep the pooled connections
+        self.session.cookies.clear()
 
         # Load the main page to fetch the CSRF token
-        main_page = self.session.get(main_page_url, headers={"User-Agent": "Mozilla/5.0"})
+        main_page = self.session.get(main_page_url, headers={"User-Agent": "Mozilla/5.0"}, timeout=Config.HTTP_TIMEOUT)
         if main_page.status_code != 200:
             raise Exception(f"Failed to fetch the main page. Status code: {main_page.status_code}")
 
         # Parse the CSRF token
-        soup = BeautifulSoup(main_page.content, "html.parser")
+        soup = BeautifulSoup(main_page.content, HTML_PARSER)
         csrf_token = soup.find("input", {"name": "csrfmiddlewaretoken"})
         csrf_token_value = csrf_token["value"] if csrf_token else None
         if not csrf_token_value:
@@ -70,13 +168,17 @@ class OioioiAPI:
             "User-Agent": "Mozilla/5.0",
         }
 
-        response = self.session.post(login_url, data=payload, headers=headers)
+        response = self.session.post(login_url, data=payload, headers=headers, timeout=Config.HTTP_TIMEOUT)
         if response.status_code != 200 or "Log out" not in response.text:
             raise Exception(f"Login failed. Status code: {response.status_code}")
 
+        self.logged_in = True
+        self.save_session_cookies()
+
     def submit_solution(self, chat_id, contest_id, problem_short_name, zip_files, branch, telegram_bot):
         """
         Submit multiple ZIP files via the OIOIOI API for the specified contest.
+        The ZIP files are (zip_name, file object) pairs as returned by create_zip_files().
         The first ZIP file is submitted as "file", and subsequent ones as "file2", "file3", etc.
         """
         try:
@@ -88,7 +190,7 @@ class OioioiAPI:
                 f"Please add the API key to continue.\n"
                 f"Use `/config` to add the API key."
             )
-            print(message)
+            logger.warning(message)
             telegram_bot.send_message(chat_id, message)
             return None
 
@@ -97,17 +199,14 @@ class OioioiAPI:
 
         # Prepare files for submission
         files = {}
-        for i, zip_file in enumerate(zip_files):
+        for i, (zip_name, zip_file) in enumerate(zip_files):
             file_key = "file" if i == 0 else f"file{i + 1}"  # Name the first file as "file"
-            files[file_key] = (os.path.basename(zip_file), open(zip_file, 'rb'))
+            zip_file.seek(0)
+            files[file_key] = (zip_name, zip_file, "application/zip")
 
         # Submit the solution
         try:
-            response = self.session.post(url, headers=headers, files=files)
-
-            # Close the opened file handles
-            for file in files.values():
-                file[1].close()
+            response = self.session.post(url, headers=headers, files=files, timeout=Config.HTTP_TIMEOUT)
 
             if response.status_code == 200:
                 submission_id = response.text.strip()
@@ -117,17 +216,17 @@ class OioioiAPI:
                     f"• *Submission ID*: `{submission_id}`\n"
                     f"• Waiting for results..."
                 )
-                print(message)
+                logger.info(message)
                 telegram_bot.send_message(chat_id, message)
                 return submission_id
             else:
                 message = f"❌ *Submission Failed*\nStatus Code: {response.status_code}\nResponse: {response.text}"
-                print(message)
+                logger.warning(message)
                 telegram_bot.send_message(chat_id, message)
                 return None
         except Exception as e:
             message = f"❌ *Submission Failed*\nError: {str(e)}"
-            print(message)
+            logger.error(message)
             telegram_bot.send_message(chat_id, message)
             return None
 
@@ -137,77 +236,117 @@ class OioioiAPI:
         """
         return f"{self.base_url}/c/{contest_id}/s/{submission_id}/"
 
-    def fetch_test_results(self, contest_id, submission_id):
+    def fetch_test_results(self, contest_id, submission_id, retry_login=True):
         """
         Fetch and parse the test results or error messages from the HTML report.
+        The report is parsed with lxml directly and the rows are walked via XPath, without building a BeautifulSoup tree.
+        Final results are cached on disk, so they are only downloaded once per submission.
+        If the session has expired, the report request is redirected or refused; then the API logs in again and retries once.
+        While the results are pending, the report is requested conditionally, so an unchanged report is neither downloaded nor parsed.
         """
+        cached_results = load_cached_results(contest_id, submission_id)
+        if cached_results:
+            return cached_results
+
         url = f"{self.base_url}/c/{contest_id}/get_report_HTML/{submission_id}/"
         try:
-            response = self.session.get(url)
+            self.ensure_logged_in()
+            response = self.session.get(
+                url, headers=self.report_validators.get((contest_id, submission_id), {}),
+                timeout=Config.HTTP_TIMEOUT, allow_redirects=False
+            )
+            if response.status_code == 304:
+                # The report has not changed since the last poll, which had no results yet
+                return None
+            if response.status_code in (301, 302, 303, 401, 403):
+                # The session has expired
+                self.logged_in = False
+                if retry_login:
+                    return self.fetch_test_results(contest_id, submission_id, retry_login=False)
+                raise Exception(f"Report not accessible after login. Status code: {response.status_code}")
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            self.report_validators.pop((contest_id, submission_id), None)
+            tree = lxml_html.fromstring(response.content)
 
             # Check if the report contains a results table
-            table = soup.select_one("table.table-report.submission")
-            if not table:
+            rows = tree.xpath(RESULTS_ROWS_XPATH)
+            if not rows:
                 # If no table is present, check for error messages in the article
-                article = soup.find("article")
-                if article:
-                    error_message = article.find("p").text.strip() if article.find("p") else "Unknown error."
-                    additional_info = article.find("pre").text.strip() if article.find("pre") else ""
-                    return {"error": f"{error_message}\n{additional_info}".strip()}
+                article = tree.find(".//article")
+                if article is not None:
+                    paragraph = article.find(".//p")
+                    pre = article.find(".//pre")
+                    error_message = paragraph.text_content().strip() if paragraph is not None else "Unknown error."
+                    additional_info = pre.text_content().strip() if pre is not None else ""
+                    error_results = {"error": f"{error_message}\n{additional_info}".strip()}
+                    save_cached_results(contest_id, submission_id, error_results)
+                    return error_results
+
+                # The results are still pending; only download the report again once it has changed
+                validators = {}
+                if response.headers.get("ETag"):
+                    validators["If-None-Match"] = response.headers["ETag"]
+                if response.headers.get("Last-Modified"):
+                    validators["If-Modified-Since"] = response.headers["Last-Modified"]
+                if validators:
+                    self.report_validators[(contest_id, submission_id)] = validators
                 return None
 
             # Parse test results grouped by the first number in the test name
-            rows = table.select('tbody tr')
             grouped_results = {}
             for row in rows:
-                cells = row.find_all('td')
+                cells = row.findall("td")
                 if len(cells) > 1:
-                    test_name = cells[1].text.strip()
-                    result = cells[2].text.strip()
-                    runtime = parse_numeric_value(cells[3].text)
+                    test_name = cells[1].text_content().strip()
+                    result = cells[2].text_content().strip()
+                    runtime = parse_numeric_value(cells[3].text_content())
 
                     # Extract group key (first number from test name)
-                    group_key = test_name.split()[0][0]  # Extract the first number
-                    if group_key.isdigit():
-                        group_key = int(group_key)
+                    group_match = TEST_GROUP_PATTERN.match(test_name)
+                    if group_match:
+                        group_key = int(group_match.group(1))
                     else:
                         group_key = "Other"  # Catch-all for ungrouped tests
 
                     # Add to grouped results
-                    if group_key not in grouped_results:
-                        grouped_results[group_key] = {
-                            "tests": [],
-                            "total_score": 0.0
-                        }
-
-                    grouped_results[group_key]["tests"].append({
-                        "test_name": test_name,
-                        "result": result,
-                        "runtime": f"{runtime:.2f}s",  # Format runtime as a string
-                    })
+                    group = grouped_results.get(group_key)
+                    if group is None:
+                        group = grouped_results[group_key] = TestGroup()
+
+                    group.tests.append(TestResult(test_name, result, runtime))
 
                     # Add to the total score for the group
                     if len(cells) > 4:
-                        score = parse_numeric_value(cells[4].text)
-                        grouped_results[group_key]["total_score"] += score
+                        group.total_score += parse_numeric_value(cells[4].text_content())
 
+            if grouped_results and is_final_result(grouped_results):
+                save_cached_results(contest_id, submission_id, grouped_results)
             return grouped_results
         except Exception as e:
-            print(f"Error fetching or parsing results: {e}")
+            logger.error(f"Error fetching or parsing results: {e}")
             return None
 
-    def wait_for_results(self, contest_id, submission_id, telegram_bot):
+    def wait_for_results(self, contest_id, submission_id, telegram_bot, timeout=Config.RESULTS_POLL_TIMEOUT):
         """
-        Poll the results page periodically and send grouped results to Telegram.
+        Poll the results page with exponential back-off and send grouped results to Telegram.
+        Early polls catch fast submissions quickly, long-running ones are polled at most every RESULTS_POLL_MAX_DELAY seconds.
+        Returns the grouped results, or None if they are not available within the timeout or the bot is shutting down.
         """
+        delay = Config.RESULTS_POLL_INITIAL_DELAY
+        deadline = time.monotonic() + timeout
         while True:
             grouped_results = self.fetch_test_results(contest_id, submission_id)
             if grouped_results:
                 results_url = self.get_results_url(contest_id, submission_id)
-                send_results_summary_to_telegram(contest_id, grouped_results, results_url, telegram_bot)
-                break
-            else:
-                print("Results not available yet. Checking again in a few seconds...")
-                time.sleep(Config.CHECK_INTERVAL)
+                send_results_summary_to_telegram(self.chat_id, contest_id, grouped_results, results_url, telegram_bot)
+                return grouped_results
+
+            if time.monotonic() + delay > deadline:
+                logger.warning(f"Results for submission {submission_id} not available after {timeout} seconds. Giving up.")
+                return None
+
+            logger.info(f"Results not available yet. Checking again in {delay} seconds...")
+            if ShutdownSignal.wait(delay):
+                logger.info(f"Shutdown requested. Stopped waiting for the results of submission {submission_id}.")
+                return None
+            delay = min(delay * 2, Config.RESULTS_POLL_MAX_DELAY)
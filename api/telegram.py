@@ -1,7 +1,37 @@
 import re
+import time
+import functools
+import logging
+import queue
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config.config import Config
 from utils.file_operations import load_chat_config
 
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096  # Telegram's maximum message length
+
+# MarkdownV2 characters that need escaping when bold markers (*) are kept
+MARKDOWN_V2_SPECIAL_CHARS = re.compile(r"[_\[\]()~`>#+\-=|{}.!]")
+
+
+@functools.lru_cache(maxsize=None)
+def get_markdown_escape_table(version, excluded_chars):
+    """
+    Build the str.translate() table that prefixes every Markdown special character with a backslash.
+    Tables are cached per Markdown version and set of excluded characters.
+    """
+    if version == 2:
+        escape_chars = r"_*[]()~`>#+-=|{}.!"
+    else:  # For MarkdownV1
+        escape_chars = r"_*[]()"
+
+    return str.maketrans({char: "\\" + char for char in escape_chars if char not in excluded_chars})
+
 
 class TelegramBot:
     def __init__(self, token):
@@ -10,6 +40,30 @@ class TelegramBot:
         """
         self.token = token
         self.base_url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+
+        # Reuse keep-alive connections to the Bot API instead of a new TLS handshake per message.
+        # sendMessage is not idempotent, so only connection failures (the request never reached Telegram) are retried;
+        # 429 responses are handled by _post_message.
+        self.session = requests.Session()
+        retries = Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=0.5)
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=Config.TELEGRAM_SEND_WORKERS, max_retries=retries))
+
+        # Messages to different chats are sent in parallel, messages to the same chat stay in order
+        self.send_pool = ThreadPoolExecutor(max_workers=Config.TELEGRAM_SEND_WORKERS, thread_name_prefix="telegram-send")
+
+        # After a 429 response all senders pause until this point in time (time.monotonic())
+        self.paused_until = 0.0
+        self.pause_lock = threading.Lock()
+
+        # Earliest points in time (time.monotonic()) for the next message overall and per chat,
+        # so sending stays within Telegram's rate limits instead of running into 429 responses
+        self.next_send_time = 0.0
+        self.next_chat_send_times = {}
+
+        # Outgoing messages are sent by a background worker, so callers never wait for Telegram
+        self.outbox = queue.Queue()
+        self.worker = threading.Thread(target=self._process_outbox, daemon=True)
+        self.worker.start()
     
     @staticmethod
     def escape_markdown(text, version=2, exclude=None):
@@ -17,22 +71,41 @@ class TelegramBot:
         Escapes Telegram Markdown characters in a given text.
         By default, it escapes for MarkdownV2.
         """
-        if exclude is None:
-            exclude = set()
+        return text.translate(get_markdown_escape_table(version, frozenset(exclude or ())))
+
+    @staticmethod
+    def split_message_by_newline(message, max_length):
+        """
+        Split the message at newline characters, ensuring no part exceeds max_length.
+        """
+        if len(message) <= max_length:
+            return [message]
 
-        if version == 2:
-            escape_chars = r"_*[]()~`>#+-=|{}.!"
-        else:  # For MarkdownV1
-            escape_chars = r"_*[]()"
+        parts = []
+        current_lines = []  # Lines of the current part, joined once the part is complete
+        current_length = 0
 
-        escape_chars = ''.join(char for char in escape_chars if char not in exclude)
+        for line in message.split("\n"):
+            # If adding the current line exceeds the limit, finalize the current part
+            if current_length + len(line) + 1 > max_length:
+                parts.append("\n".join(current_lines).strip())
+                current_lines.clear()
+                current_length = 0
 
-        return re.sub(f"([{re.escape(escape_chars)}])", r"\\\1", text)
+            current_lines.append(line)
+            current_length += len(line) + 1
+
+        # Append any remaining text as the last part
+        if current_lines:
+            parts.append("\n".join(current_lines).strip())
+
+        return parts
 
     def send_message(self, chat_id, message, parse_mode="MarkdownV2", disable_web_page_preview=True, broadcast_mode=True, bypass_escaping=False):
         """
         Send a message to a single chat or broadcast to additional configured chat IDs if broadcast_mode is enabled.
-        Automatically splits long messages if needed. Splits at newline characters when possible.
+        The message is queued and sent by the outbox worker, which merges messages to the same chat
+        that arrive within TELEGRAM_BATCH_WINDOW seconds. Long messages are split at newline characters.
 
         Args:
             chat_id (int): The primary chat ID to send the message to.
@@ -41,75 +114,200 @@ class TelegramBot:
             disable_web_page_preview (bool): Whether to disable link previews (default: True).
             broadcast_mode (bool): Whether to broadcast the message to additional configured chat IDs (default: True).
         """
-        max_length = 4096  # Telegram's maximum message length
+        # Escape special characters while keeping bold and italic (skipped if there is nothing to escape)
+        if not bypass_escaping and MARKDOWN_V2_SPECIAL_CHARS.search(message):
+            message = TelegramBot.escape_markdown(message, 2, {"*"})
 
-        def split_message_by_newline(message, max_length):
-            """
-            Split the message at newline characters, ensuring no part exceeds max_length.
-            """
-            if len(message) <= max_length:
-                return [message]
+        chat_ids = [chat_id]
+        if broadcast_mode:
+            # Fetch additional chat IDs from the config
+            config = load_chat_config(chat_id)
+            chat_ids += config.get("broadcast_chat_ids", [])
 
-            parts = []
-            current_part = ""
+        self.outbox.put((chat_ids, message, parse_mode, disable_web_page_preview))
 
-            for line in message.split("\n"):
-                # If adding the current line exceeds the limit, finalize the current part
-                if len(current_part) + len(line) + 1 > max_length:
-                    parts.append(current_part.strip())
-                    current_part = ""
+    def close(self):
+        """
+        Send all queued messages and stop the outbox worker.
+        """
+        self.outbox.put(None)
+        self.worker.join()
+        self.send_pool.shutdown()
+        self.session.close()
 
-                current_part += line + "\n"
+    def _process_outbox(self):
+        """
+        Outbox worker: collects queued messages for a short window and sends them in as few requests as possible.
+        """
+        running = True
+        while running:
+            item = self.outbox.get()
+            if item is None:
+                self.outbox.task_done()
+                break
 
-            # Append any remaining text as the last part
-            if current_part:
-                parts.append(current_part.strip())
+            # Collect further messages until the batch window has passed
+            batch = [item]
+            deadline = time.monotonic() + Config.TELEGRAM_BATCH_WINDOW
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.outbox.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    self.outbox.task_done()
+                    break
+                batch.append(item)
 
-            return parts
+            try:
+                self._send_batch(batch)
+            finally:
+                for _ in batch:
+                    self.outbox.task_done()
 
-        # Escape special characters while keeping bold and italic
-        if not bypass_escaping:
-            message = TelegramBot.escape_markdown(message, 2, {"*"})
+    def _send_batch(self, batch):
+        """
+        Merge all messages of a batch per chat (keeping their order) and send them.
+        Different chats are served concurrently by the send pool; the call returns once all messages are sent.
+        """
+        merged_messages = {}
+        for chat_ids, message, parse_mode, disable_web_page_preview in batch:
+            for single_chat_id in chat_ids:
+                merged_messages.setdefault((single_chat_id, parse_mode, disable_web_page_preview), []).append(message)
 
-        # Split message using the newline-aware function
-        split_messages = split_message_by_newline(message, max_length)
+        pending_sends = []
+        for (single_chat_id, parse_mode, disable_web_page_preview), messages in merged_messages.items():
+            pending_sends.append(self.send_pool.submit(
+                self._send_to_single_chat, single_chat_id, messages, parse_mode, disable_web_page_preview
+            ))
+        wait(pending_sends)
 
-        chat_ids = [chat_id]
-        if broadcast_mode:
-            # Fetch additional chat IDs from the config
-            config = load_chat_config(chat_id)
-            chat_ids += config.get("broadcast_chat_ids", [])
+    @staticmethod
+    def group_messages(messages, max_length):
+        """
+        Group consecutive messages so that each group, joined by blank lines, fits into max_length.
+        A message that is too long on its own forms a group by itself.
+        """
+        groups = []
+        current_group = []
+        current_length = 0
+
+        for message in messages:
+            added_length = len(message) + (2 if current_group else 0)  # Two newlines between merged messages
+            if current_group and current_length + added_length > max_length:
+                groups.append(current_group)
+                current_group = []
+                current_length = 0
+                added_length = len(message)
+
+            current_group.append(message)
+            current_length += added_length
 
-        # Send messages to all specified chat IDs
-        for single_chat_id in chat_ids:
-            self._send_to_single_chat(single_chat_id, split_messages, parse_mode, disable_web_page_preview)
+        if current_group:
+            groups.append(current_group)
+        return groups
 
     def _send_to_single_chat(self, chat_id, messages, parse_mode, disable_web_page_preview):
         """
-        Helper method to send multiple parts of a message to a single chat.
+        Helper method to send the queued messages of a single chat, merging consecutive messages into as few
+        API calls as possible. If Telegram rejects a merged message (e.g. because one of the messages contains
+        broken Markdown), its messages are sent one by one, so only the broken message is lost.
 
         Args:
             chat_id (int): The chat ID to send messages to.
-            messages (list): List of message parts to send.
+            messages (list): List of messages to send, in order.
             parse_mode (str): The parse mode for Telegram Markdown.
             disable_web_page_preview (bool): Whether to disable link previews.
         """
-        for part in messages:
-            payload = {
-                "chat_id": chat_id,
-                "text": part.strip(),
-                "parse_mode": parse_mode,
-                "disable_web_page_preview": disable_web_page_preview,
-            }
+        for group in TelegramBot.group_messages(messages, TELEGRAM_MAX_MESSAGE_LENGTH):
+            if len(group) > 1:
+                if self._send_part(chat_id, "\n\n".join(group), parse_mode, disable_web_page_preview) != 400:
+                    continue
+                logger.warning(f"Merged message rejected by chat {chat_id}. Sending its {len(group)} messages one by one.")
+
+            for message in group:
+                # Long messages are split at newline characters
+                for part in TelegramBot.split_message_by_newline(message, TELEGRAM_MAX_MESSAGE_LENGTH):
+                    self._send_part(chat_id, part, parse_mode, disable_web_page_preview)
+
+    def _send_part(self, chat_id, text, parse_mode, disable_web_page_preview):
+        """
+        Send a single message part to a chat. Returns the HTTP status code, or None if the request failed.
+        """
+        payload = {
+            "chat_id": chat_id,
+            "text": text.strip(),
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": disable_web_page_preview,
+        }
+        try:
+            response = self._post_message(payload)
+            if response.status_code == 200:
+                logger.info(f"Message sent to chat {chat_id} successfully.")
+            else:
+                logger.warning(f"Failed to send message to chat {chat_id}. Status code: {response.status_code}\nResponse: {response.text}")
+            return response.status_code
+        except Exception as e:
+            logger.error(f"Error sending message to chat {chat_id}: {e}")
+            return None
+
+    def _post_message(self, payload):
+        """
+        Post a single message to the Bot API and return the response.
+        A 429 response pauses all senders for the "retry_after" time reported by Telegram (capped at
+        TELEGRAM_MAX_RETRY_AFTER seconds), after which the message is retried up to TELEGRAM_MAX_RETRIES times.
+        """
+        attempt = 0
+        while True:
+            self._wait_for_send_slot(payload["chat_id"])
+            response = self.session.post(self.base_url, data=payload, timeout=Config.HTTP_TIMEOUT)
+            if response.status_code != 429 or attempt >= Config.TELEGRAM_MAX_RETRIES:
+                return response
+
             try:
-                response = requests.post(self.base_url, data=payload)
-                if response.status_code == 200:
-                    print(f"Message sent to chat {chat_id} successfully.")
-                else:
-                    print(f"Failed to send message to chat {chat_id}. Status code: {response.status_code}")
-                    print(f"Response: {response.text}")
-            except Exception as e:
-                print(f"Error sending message to chat {chat_id}: {e}")
+                retry_after = response.json()["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                retry_after = 1
+            # Back off exponentially if Telegram keeps rejecting the message
+            retry_after = min(max(retry_after, 2 ** attempt), Config.TELEGRAM_MAX_RETRY_AFTER)
+            attempt += 1
+
+            logger.warning(f"Telegram rate limit hit. Pausing all messages for {retry_after} seconds.")
+            with self.pause_lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def _wait_for_send_slot(self, chat_id):
+        """
+        Block until the next message to the chat may be sent without exceeding TELEGRAM_CHAT_RATE messages per second
+        to the chat or TELEGRAM_GLOBAL_RATE messages per second overall, and while sending is paused after a 429 response.
+        """
+        with self.pause_lock:
+            chat_send_time = self.next_chat_send_times.get(chat_id, 0.0)
+        time.sleep(max(0.0, chat_send_time - time.monotonic()))
+
+        self._wait_while_paused()
+
+        with self.pause_lock:
+            now = time.monotonic()
+            send_time = max(now, self.next_send_time)
+            self.next_send_time = send_time + 1 / Config.TELEGRAM_GLOBAL_RATE
+            self.next_chat_send_times[chat_id] = send_time + 1 / Config.TELEGRAM_CHAT_RATE
+        time.sleep(send_time - now)
+
+    def _wait_while_paused(self):
+        """
+        Block while sending is paused after a 429 response.
+        """
+        while True:
+            with self.pause_lock:
+                remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
 
     def broadcast_message(self, chat_ids, message):
         """
@@ -10,4 +10,32 @@ class Config:
     CHECK_INTERVAL = 10
     BACKOFF_TIME = timedelta(minutes=10)
     OIOIOI_BASE_URL = "https://algeng.inet.tu-berlin.de"
+    HTTP_TIMEOUT = 30
+    RESULTS_CACHE_SIZE = 200
+    RESULTS_POLL_INITIAL_DELAY = 2
+    RESULTS_POLL_MAX_DELAY = 30
+    RESULTS_POLL_TIMEOUT = 3600
+    JUDGE_CACHE_SIZE = 200
+    JUDGE_CACHE_TTL = timedelta(days=1)
+    COMPILE_CACHE_SIZE = 200
+    COMPILE_CACHE_TTL = timedelta(days=1)
+    TELEGRAM_BATCH_WINDOW = 0.25
+    TELEGRAM_SEND_WORKERS = 8
+    TELEGRAM_MAX_RETRIES = 3
+    TELEGRAM_MAX_RETRY_AFTER = 60
+    TELEGRAM_GLOBAL_RATE = 30  # Messages per second across all chats
+    TELEGRAM_CHAT_RATE = 1  # Messages per second to a single chat
+    MAX_PARALLEL_CHATS = 8
+    MAX_PARALLEL_BRANCHES = 4
+    MAX_PARALLEL_COMPILES = os.cpu_count() or 1  # Compiler processes running at the same time across all chats
+    ZIP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+    ZIP_COMPRESSION_LEVEL = 1
+    LOG_BUFFER_CAPACITY = 256
+    JOURNAL_COMPACTION_FACTOR = 4
+    JOURNAL_MIN_SIZE = 64
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "0"))  # 0 disables the webhook endpoint
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Required if WEBHOOK_PORT is set
+    WEBHOOK_MAX_BODY_SIZE = 64 * 1024
+    WEBHOOK_FALLBACK_INTERVAL = 300
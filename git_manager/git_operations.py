@@ -1,11 +1,20 @@
 import os
 import subprocess
 import json
-from utils.file_operations import load_chat_config, get_chat_dir, get_repo_path
+import logging
+import functools
+import tempfile
+import threading
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+from config.config import Config
+from utils.file_operations import load_chat_config, get_chat_dir, get_repo_path, resolve_include_paths, JsonJournal
 from urllib.parse import urlparse
 
-# Centralized file for storing last commits
-LAST_COMMITS_FILE = "data/last_commits.json"
+logger = logging.getLogger(__name__)
+
+# Centralized journal for storing last commits
+LAST_COMMITS_FILE = "data/last_commits.jsonl"
+LEGACY_LAST_COMMITS_FILE = "data/last_commits.json"  # Former single-document format, imported on startup
 
 # Ensure the data directory exists
 os.makedirs(os.path.dirname(LAST_COMMITS_FILE), exist_ok=True)
@@ -31,59 +40,65 @@ def generate_ssh_key(chat_id):
     if not os.path.exists(chat_dir):
         os.makedirs(chat_dir)
 
-    subprocess.run(["ssh-keygen", "-t", "rsa", "-b", "4096", "-f", ssh_key_path, "-N", ""])
+    # The fingerprint and randomart printed by ssh-keygen are not needed
+    subprocess.run(["ssh-keygen", "-t", "rsa", "-b", "4096", "-f", ssh_key_path, "-N", ""], stdout=subprocess.DEVNULL)
 
     return ssh_key_path
 
 
 # Last Commit Management
-def load_last_commit(chat_id, branch="submit"):
+# Last processed commit per chat ID and branch. Every change appends one line to the journal,
+# which is synced to disk once per CI iteration by flush_last_commits().
+last_commit_journal = JsonJournal(LAST_COMMITS_FILE)
+
+
+def import_legacy_last_commits():
     """
-    Load the last commit hash for a given chat ID and branch from the centralized JSON file.
+    Move the last commits from the former JSON file into the journal.
     """
-    if not os.path.exists(LAST_COMMITS_FILE):
-        return None
+    if not os.path.exists(LEGACY_LAST_COMMITS_FILE):
+        return
 
-    with open(LAST_COMMITS_FILE, "r") as file:
+    with open(LEGACY_LAST_COMMITS_FILE, "r") as file:
         last_commits = json.load(file)
+    last_commit_journal.update(
+        ((chat_id, branch), commit_hash)
+        for chat_id, branches in last_commits.items()
+        for branch, commit_hash in branches.items()
+    )
+    os.remove(LEGACY_LAST_COMMITS_FILE)
 
-    return last_commits.get(str(chat_id), {}).get(branch, None)
+
+def load_last_commit(chat_id, branch="submit"):
+    """
+    Load the last commit hash for a given chat ID and branch.
+    """
+    return last_commit_journal.get((str(chat_id), branch))
 
 
 def save_last_commit(chat_id, branch, commit_hash):
     """
-    Save the last commit hash for a given chat ID and branch to the centralized JSON file.
+    Record the last commit hash for a given chat ID and branch.
+    The change is appended to the journal right away and synced to disk by the next flush_last_commits() call.
     """
-    if os.path.exists(LAST_COMMITS_FILE):
-        with open(LAST_COMMITS_FILE, "r") as file:
-            last_commits = json.load(file)
-    else:
-        last_commits = {}
-
-    if str(chat_id) not in last_commits:
-        last_commits[str(chat_id)] = {}
+    last_commit_journal.set((str(chat_id), branch), commit_hash)
 
-    last_commits[str(chat_id)][branch] = commit_hash
 
-    with open(LAST_COMMITS_FILE, "w") as file:
-        json.dump(last_commits, file, indent=4)
+def flush_last_commits():
+    """
+    Sync all recorded last commits to disk.
+    """
+    last_commit_journal.sync()
 
 
 def delete_last_commit_data(chat_id):
     """
     Delete the stored last commit data for a specific chat ID.
     """
-    if os.path.exists(LAST_COMMITS_FILE):
-        with open(LAST_COMMITS_FILE, "r") as file:
-            last_commits = json.load(file)
-
-        # Remove the chat ID's data if it exists
-        if str(chat_id) in last_commits:
-            del last_commits[str(chat_id)]
-
-            # Save the updated data back to the file
-            with open(LAST_COMMITS_FILE, "w") as file:
-                json.dump(last_commits, file, indent=4)
+    for key, _ in last_commit_journal.items():
+        if key[0] == str(chat_id):
+            last_commit_journal.delete(key)
+    last_commit_journal.sync()
 
 
 # Helper Function for Git Commands
@@ -95,25 +110,28 @@ def execute_git_command(chat_id, command, telegram_bot=None, failure_message=Non
     config = load_chat_config(chat_id)
     access_type = config.get("auth_method")
 
-    # Prepare environment for SSH if needed
+    # Prepare environment for SSH if needed. Git must fail instead of waiting for credentials on a terminal.
     env = os.environ.copy()
+    env["GIT_TERMINAL_PROMPT"] = "0"
     if access_type == "ssh":
         ssh_key_path = os.path.abspath(os.path.join(get_chat_dir(chat_id), "id_rsa"))
         git_ssh_command = f"ssh -i {ssh_key_path} -o IdentitiesOnly=yes"
         env["GIT_SSH_COMMAND"] = git_ssh_command
 
     try:
-        # Execute the Git command
+        # Execute the Git command. The output is captured as bytes; stderr is only decoded if the command fails.
         result = subprocess.check_output(
             ["git", "-C", repo_path] + command,
             env=env,
-            text=True,
-        ).strip()
-        return result
+            stdin=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        return result.decode(errors="replace").strip()
     except subprocess.CalledProcessError as e:
+        logger.warning(f"Git command failed: {e}\n{e.stderr.decode(errors='replace').strip()}")
         if telegram_bot and failure_message:
             telegram_bot.send_message(chat_id, failure_message)
-        raise RuntimeError(f"Git command failed: {e}")
+        raise RuntimeError(f"Git command failed: {e}") from e
 
 
 # Repository Operations
@@ -128,14 +146,18 @@ def clone_repository(chat_id, repo_url, telegram_bot=None):
     if not os.path.exists(repo_path):
         os.makedirs(repo_path)
 
+    # Git must fail instead of waiting for credentials on a terminal; progress output is not needed
+    env = os.environ.copy()
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    clone_options = {"check": True, "env": env, "stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL}
+
     try:
         if access_type == "ssh":
             repo_url = convert_https_to_ssh(repo_url)
             ssh_key_path = os.path.abspath(os.path.join(get_chat_dir(chat_id), "id_rsa"))
             git_ssh_command = f"ssh -i {ssh_key_path} -o IdentitiesOnly=yes"
-            env = os.environ.copy()
             env["GIT_SSH_COMMAND"] = git_ssh_command
-            subprocess.run(["git", "clone", repo_url, repo_path], check=True, env=env)
+            subprocess.run(["git", "clone", "--quiet", repo_url, repo_path], **clone_options)
 
         elif access_type == "https":
             # Embed credentials directly in the URL
@@ -150,11 +172,11 @@ def clone_repository(chat_id, repo_url, telegram_bot=None):
             )
 
             # Clone the repository
-            subprocess.run(["git", "clone", repo_url_with_credentials, repo_path], check=True)
+            subprocess.run(["git", "clone", "--quiet", repo_url_with_credentials, repo_path], **clone_options)
 
         else:
             # Handle cases with no authentication
-            subprocess.run(["git", "clone", repo_url, repo_path], check=True)
+            subprocess.run(["git", "clone", "--quiet", repo_url, repo_path], **clone_options)
 
     except subprocess.CalledProcessError:
         # Mask credentials in the error message
@@ -188,74 +210,95 @@ def mask_url_credentials(url):
     return url
 
 
-def fetch_all_branches(chat_id, telegram_bot):
+def fetch_branches(chat_id, branches, telegram_bot):
     """
-    Fetch all branches from the remote repository for the given chat ID.
+    Fetch the given branches from the remote repository for the given chat ID into their remote-tracking refs.
+    Tags and FETCH_HEAD are not needed by the bot, so they are neither negotiated nor written.
     """
+    refspecs = [f"+refs/heads/{branch}:refs/remotes/origin/{branch}" for branch in branches]
     try:
-        execute_git_command(chat_id, ["fetch", "--all"], telegram_bot, "❌ *Git Error: Fetch Failed*")
+        execute_git_command(
+            chat_id,
+            ["fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "origin"] + refspecs,
+            telegram_bot,
+            "❌ *Git Error: Fetch Failed*"
+        )
     except RuntimeError as e:
         raise RuntimeError("Error fetching branches") from e
 
 
-def get_latest_commit(chat_id, branch, telegram_bot):
+def get_changed_remote_branches(chat_id, latest_commits, telegram_bot):
     """
-    Get the latest commit hash on the specified branch for a given chat ID.
+    Check with a single `git ls-remote` round-trip which remote branches differ from the local
+    remote-tracking refs in `latest_commits` (as returned by get_all_latest_commits()).
+    Returns the names of the new and updated branches. Branches that were deleted on the remote are ignored,
+    as their stale refs are never processed again.
     """
     try:
-        return execute_git_command(
-            chat_id,
-            ["rev-parse", f"origin/{branch}"],
-            telegram_bot,
-            f"⚠️ *Git Warning: Branch Missing*\nBranch: `{branch}` is unavailable."
-        )
-    except RuntimeError:
-        return None
+        output = execute_git_command(chat_id, ["ls-remote", "--heads", "origin"], telegram_bot, "❌ *Git Error: Fetch Failed*")
+    except RuntimeError as e:
+        raise RuntimeError("Error fetching branches") from e
 
+    changed_branches = []
+    for line in output.splitlines():
+        commit_hash, ref_name = line.split("\t")
+        branch = ref_name[len("refs/heads/"):]
+        if latest_commits.get(branch) != commit_hash:
+            changed_branches.append(branch)
+    return changed_branches
 
-def get_commit_message(chat_id, commit_hash, telegram_bot=None):
+
+def get_all_latest_commits(chat_id, telegram_bot):
     """
-    Retrieve the commit message for the specified commit hash in the user's repository.
+    Get the latest commit hash of every remote branch for a given chat ID using a single Git call.
+    Returns a dictionary mapping branch names (without the `origin/` prefix) to commit hashes.
     """
-    failure_message = (
-        f"❌ *Git Error: Commit Message Retrieval Failed*\n"
-        f"Commit: `{commit_hash}`\n"
-        f"Unable to retrieve the commit message. Please ensure the commit exists."
-    )
-    return execute_git_command(
+    output = execute_git_command(
         chat_id,
-        ["log", "-1", "--pretty=%B", commit_hash],
+        ["for-each-ref", "--format=%(refname:strip=3)%09%(objectname)", "refs/remotes/origin"],
         telegram_bot,
-        failure_message
+        "❌ *Git Error: Branch Lookup Failed*"
     )
 
+    latest_commits = {}
+    for line in output.splitlines():
+        branch, commit_hash = line.split("\t")
+        if branch != "HEAD":
+            latest_commits[branch] = commit_hash
+    return latest_commits
 
-def reset_to_commit(chat_id, branch, commit_hash, telegram_bot):
+
+def get_commit_message(chat_id, commit_hash, telegram_bot=None):
     """
-    Reset the repository to the specified commit for the given chat ID.
+    Retrieve the commit message for the specified commit hash in the user's repository.
+    The commit object is read through the repository's object reader, so no Git process is spawned.
     """
     try:
-        execute_git_command(chat_id, ["checkout", branch])
-        execute_git_command(chat_id, ["reset", "--hard", commit_hash])
-    except RuntimeError as e:
-        telegram_bot.send_message(
-            chat_id,
-            f"❌ *Git Error: Reset Failed*\nBranch: `{branch}`\nCommit: `{commit_hash}`\nDetails: {str(e)}"
-        )
-        raise RuntimeError(f"Error resetting branch {branch} to commit {commit_hash}")
+        return read_commit_message(get_repo_path(chat_id), commit_hash)
+    except (OSError, RuntimeError):
+        if telegram_bot:
+            telegram_bot.send_message(
+                chat_id,
+                f"❌ *Git Error: Commit Message Retrieval Failed*\n"
+                f"Commit: `{commit_hash[:7]}`\n"
+                f"Unable to retrieve the commit message. Please ensure the commit exists."
+            )
+        raise RuntimeError(f"Commit {commit_hash} not found.")
 
 
-def get_tracked_branches(chat_id, telegram_bot):
+def get_tracked_branches(chat_id, latest_commits, telegram_bot):
     """
     Retrieve the list of branches to track for the given chat ID.
     Defaults to the primary branch specified in the global configuration.
+    The primary branch's commit is looked up in `latest_commits` as returned by get_all_latest_commits().
     Raises an exception for critical errors.
     """
     global_config = load_chat_config(chat_id)
     primary_branch = global_config.get("primary_branch", "master")
 
-    primary_branch_commit = get_latest_commit(chat_id, primary_branch, telegram_bot)
+    primary_branch_commit = latest_commits.get(primary_branch)
     if not primary_branch_commit:
+        telegram_bot.send_message(chat_id, f"⚠️ *Git Warning: Branch Missing*\nBranch: `{primary_branch}` is unavailable.")
         raise RuntimeError(
             f"Failed to retrieve the latest commit for branch `{primary_branch}`. "
             f"Ensure the branch exists and is up-to-date."
@@ -278,18 +321,330 @@ def get_tracked_branches(chat_id, telegram_bot):
         raise RuntimeError(error_message) from e
 
 
+class GitObjectReader:
+    """
+    Long-lived `git cat-file --batch` process for a repository.
+    Objects are requested through its stdin, so reading a file from a commit does not spawn a new Git process.
+    The process is restarted if it has exited or the repository has been cloned again.
+    """
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self.process = None
+        self.git_dir_inode = None
+
+    def _ensure_process(self):
+        """
+        Start the cat-file process if needed. Must be called with the lock held.
+        """
+        git_dir_inode = os.stat(os.path.join(self.repo_path, ".git")).st_ino
+        if self.process is not None and self.process.poll() is None and git_dir_inode == self.git_dir_inode:
+            return
+
+        self._close_process()
+        self.process = subprocess.Popen(
+            ["git", "-C", self.repo_path, "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.git_dir_inode = git_dir_inode
+
+    def _close_process(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+    def read(self, object_name):
+        """
+        Return the content of an object (e.g. `<commit>:<path>`) as bytes, or None if it does not exist.
+        """
+        git_object = self.read_object(object_name)
+        return git_object[1] if git_object else None
+
+    def read_object(self, object_name):
+        """
+        Return the type (e.g. "blob" or "tree") and content of an object, or None if it does not exist.
+        """
+        with self.lock:
+            self._ensure_process()
+            try:
+                self.process.stdin.write(object_name.encode() + b"\n")
+                self.process.stdin.flush()
+
+                # The header is "<sha> <type> <size>" or "<object_name> missing"
+                header = self.process.stdout.readline()
+                if not header:
+                    raise RuntimeError(f"git cat-file exited unexpectedly in {self.repo_path}")
+                header_fields = header.split()
+                if len(header_fields) != 3 or not header_fields[2].isdigit():
+                    return None
+
+                content = self.process.stdout.read(int(header_fields[2]))
+                self.process.stdout.read(1)  # Trailing newline
+                return header_fields[1].decode(), content
+            except (OSError, RuntimeError):
+                self._close_process()
+                raise
+
+    def close(self):
+        with self.lock:
+            self._close_process()
+
+
+# One object reader per repository, created on first use
+object_readers = {}
+object_readers_lock = threading.Lock()
+
+
+def get_object_reader(chat_id):
+    """
+    Get the object reader for the repository of the given chat ID.
+    """
+    return get_object_reader_for_path(get_repo_path(chat_id))
+
+
+def get_object_reader_for_path(repo_path):
+    """
+    Get the object reader for the repository at the given path.
+    """
+    with object_readers_lock:
+        if repo_path not in object_readers:
+            object_readers[repo_path] = GitObjectReader(repo_path)
+        return object_readers[repo_path]
+
+
+def close_object_readers():
+    """
+    Stop all cat-file processes.
+    """
+    with object_readers_lock:
+        for object_reader in object_readers.values():
+            object_reader.close()
+        object_readers.clear()
+
+
+@functools.lru_cache(maxsize=256)
+def read_commit_message(repo_path, commit_hash):
+    """
+    Read the message of a commit of the given repository.
+    Commits are immutable, so the result is cached per repository and commit hash. Missing commits raise
+    a RuntimeError and are not cached, as they may still arrive with the next fetch.
+    """
+    commit_data = get_object_reader_for_path(repo_path).read(commit_hash)
+    if commit_data is None:
+        raise RuntimeError(f"Commit {commit_hash} not found.")
+
+    # A commit object consists of its headers, an empty line and the message
+    return commit_data.partition(b"\n\n")[2].decode(errors="replace").strip()
+
+
+@functools.lru_cache(maxsize=64)
+def read_config_at_commit(repo_path, commit_hash, config_filename):
+    """
+    Read and parse a configuration file from a commit of the given repository.
+    Commits are immutable, so the result is cached per repository, commit hash and file name.
+    """
+    try:
+        config_data = get_object_reader_for_path(repo_path).read(f"{commit_hash}:{config_filename}")
+    except (OSError, RuntimeError):
+        config_data = None
+
+    if config_data is None:
+        raise FileNotFoundError(f"Configuration file '{config_filename}' not found in commit {commit_hash}.")
+    return json.loads(config_data)
+
+
 def load_config_from_commit(chat_id, commit_hash, config_filename="submission_config.json"):
     """
     Load submission configuration from a specific commit.
+    `commit_hash` must be a full commit hash. The returned dictionary is shared between callers and must not be modified.
+    """
+    return read_config_at_commit(get_repo_path(chat_id), commit_hash, config_filename)
+
+
+def parse_tree(tree_data, hash_size):
+    """
+    Parse the content of a Git tree object into (mode, object_type, object_hash, name) tuples.
+    Each entry is stored as "<mode> <name>\\0" followed by the raw object hash of `hash_size` bytes.
     """
+    entries = []
+    position = 0
+    while position < len(tree_data):
+        header_end = tree_data.index(b"\0", position)
+        mode, name = tree_data[position:header_end].decode(errors="surrogateescape").split(" ", 1)
+        object_hash = tree_data[header_end + 1:header_end + 1 + hash_size].hex()
+        position = header_end + 1 + hash_size
+
+        if mode == "40000":
+            object_type = "tree"
+        elif mode == "160000":
+            object_type = "commit"  # Submodule
+        else:
+            object_type = "blob"
+        entries.append((mode, object_type, object_hash, name))
+    return entries
+
+
+def list_commit_files(chat_id, commit_hash, path):
+    """
+    List all entries below `path` (a file or directory relative to the repository root) in the tree of a commit,
+    like `git ls-tree -r`. The trees are read through the repository's object reader, so no Git process is spawned.
+    Returns (mode, object_type, object_hash, file_path) tuples.
+    """
+    object_reader = get_object_reader(chat_id)
+    hash_size = len(commit_hash) // 2
+
+    if path == os.curdir:
+        root_entries = [("40000", "tree", f"{commit_hash}^{{tree}}", "")]
+    else:
+        # Look up the path's own entry in its parent tree, which also provides the file mode
+        parent_path, name = os.path.split(path)
+        parent_tree = object_reader.read_object(f"{commit_hash}:{parent_path}")
+        if parent_tree is None or parent_tree[0] != "tree":
+            return []
+        root_entries = [
+            (mode, object_type, object_hash, path)
+            for mode, object_type, object_hash, entry_name in parse_tree(parent_tree[1], hash_size)
+            if entry_name == name
+        ]
+
+    entries = []
+    pending_entries = root_entries
+    while pending_entries:
+        mode, object_type, object_hash, file_path = pending_entries.pop()
+        if object_type != "tree":
+            entries.append((mode, object_type, object_hash, file_path))
+            continue
+
+        tree = object_reader.read_object(object_hash)
+        if tree is None or tree[0] != "tree":
+            raise RuntimeError(f"Tree {object_hash} of commit {commit_hash} could not be read.")
+        subtree_entries = [
+            (entry_mode, entry_type, entry_hash, os.path.join(file_path, entry_name))
+            for entry_mode, entry_type, entry_hash, entry_name in parse_tree(tree[1], hash_size)
+        ]
+        pending_entries.extend(reversed(subtree_entries))  # Keep the tree order
+    return entries
+
+
+def create_zip_files(config, chat_id, commit_hash):
+    """
+    Create multiple ZIP files based on the `zip_files` configuration provided.
+    Allows specifying destination paths for files and folders within the ZIP.
+    The files are read directly from the objects of the given commit, so the working tree is neither needed nor touched.
+    Returns a list of (zip_name, file object) pairs. The archives are kept in memory unless they grow beyond
+    Config.ZIP_SPOOL_MAX_SIZE, in which case they are moved to a temporary file. Close them with close_zip_files().
+    Files are deflated at Config.ZIP_COMPRESSION_LEVEL; the fastest level already shrinks source code a lot,
+    which keeps the uploads to the judge small at little CPU cost.
+
+    Parameters:
+        config (dict): Configuration dictionary containing "zip_files".
+        chat_id (int or str): Chat ID to determine the repository.
+        commit_hash (str): Commit to take the files from.
+    """
+    object_reader = get_object_reader(chat_id)
+    created_files = []
+
+    for zip_config in config.get("zip_files", []):
+        zip_name = zip_config.get("zip_name", "submission.zip")
+        include_paths = resolve_include_paths(
+            tuple((path_mapping["source"], path_mapping["destination"]) for path_mapping in zip_config.get("include_paths", []))
+        )
+        zip_file = tempfile.SpooledTemporaryFile(max_size=Config.ZIP_SPOOL_MAX_SIZE)
+
+        with ZipFile(zip_file, 'w') as zipf:
+            for source_path, destination_path in include_paths:
+                entries = list_commit_files(chat_id, commit_hash, source_path)
+                if not entries:
+                    logger.warning(f"Warning: Path '{source_path}' not found in the repository.")
+
+                for mode, object_type, object_hash, file_path in entries:
+                    # Skip symlinks and submodules
+                    if object_type != "blob" or mode == "120000":
+                        logger.warning(f"Skipping unsafe or invalid path: '{file_path}'")
+                        continue
+
+                    # A file is stored under the destination itself, a directory's files below the destination folder
+                    if file_path == source_path:
+                        archive_name = destination_path
+                    else:
+                        archive_name = os.path.join(destination_path, os.path.relpath(file_path, source_path))
+
+                    zip_info = ZipInfo(os.path.normpath(archive_name).lstrip("/"))
+                    zip_info.external_attr = int(mode, 8) << 16  # Keep the file permissions
+                    zipf.writestr(
+                        zip_info, object_reader.read(object_hash),
+                        compress_type=ZIP_DEFLATED, compresslevel=Config.ZIP_COMPRESSION_LEVEL
+                    )
+
+        zip_file.seek(0)
+        created_files.append((zip_name, zip_file))
+
+    return created_files
+
+
+# One lock per repository, serializing the auto-merges into its primary branch
+merge_locks = {}
+merge_locks_lock = threading.Lock()
+
+
+def get_merge_lock(chat_id):
+    """
+    Get the lock serializing the auto-merges of the repository of the given chat ID.
+    Branches of a chat are processed concurrently; without the lock, two merges based on the same
+    state of the primary branch would race and the second push would be rejected.
+    """
+    repo_path = get_repo_path(chat_id)
+    with merge_locks_lock:
+        if repo_path not in merge_locks:
+            merge_locks[repo_path] = threading.Lock()
+        return merge_locks[repo_path]
+
+
+def merge_and_push(chat_id, branch, primary_branch, commit_hash, commit_message, telegram_bot=None):
+    """
+    Merge a commit into the remote-tracking ref of the primary branch and push the merge commit.
+    The merge is computed in the object database with `git merge-tree`, which neither touches the working tree
+    nor the index. Returns False if the merge has conflicts. Failures are reported to `telegram_bot`, if given.
+    """
+    # `git merge-tree` exits with 1 if the merge has conflicts
     try:
-        config_data = execute_git_command(
+        merge_tree = execute_git_command(
             chat_id,
-            ["show", f"{commit_hash}:{config_filename}"],
-        )
-        return json.loads(config_data)
-    except RuntimeError:
-        raise FileNotFoundError(f"Configuration file '{config_filename}' not found in commit {commit_hash}.")
+            ["merge-tree", "--write-tree", "--no-messages", f"refs/remotes/origin/{primary_branch}", commit_hash]
+        ).splitlines()[0]
+    except RuntimeError as e:
+        if isinstance(e.__cause__, subprocess.CalledProcessError) and e.__cause__.returncode == 1:
+            return False
+        raise
+
+    # Create the merge commit on top of the primary branch and the tested commit
+    commit_failure_message = (
+        f"❌ *Auto-Merge Failed*\n"
+        f"Failed to commit the merge changes for `{branch}` into `{primary_branch}`."
+    )
+    merge_commit = execute_git_command(
+        chat_id,
+        ["commit-tree", merge_tree, "-p", f"refs/remotes/origin/{primary_branch}", "-p", commit_hash, "-m", commit_message],
+        telegram_bot,
+        commit_failure_message
+    )
+
+    # Push the merge commit to the remote primary branch
+    push_failure_message = (
+        f"❌ *Push Failed*\n"
+        f"The merged changes for `{primary_branch}` could not be pushed to the remote."
+    )
+    execute_git_command(
+        chat_id,
+        ["push", "origin", f"{merge_commit}:refs/heads/{primary_branch}"],
+        telegram_bot,
+        push_failure_message
+    )
+    return True
 
 
 def perform_auto_merge(chat_id, branch, grouped_results, commit_hash, telegram_bot):
@@ -297,16 +652,38 @@ def perform_auto_merge(chat_id, branch, grouped_results, commit_hash, telegram_b
     Automatically merge the specified branch into primary_branch after successful testing.
     Includes a short summary of test results in the commit message.
     Only performs the merge if there are no conflicts.
+    The merge is computed with `git merge-tree` and pushed directly, so the working tree is never checked out.
+    The primary branch is only fetched again if the merge based on the last fetch cannot be pushed.
+    Requires Git 2.38 or newer.
     """
     global_config = load_chat_config(chat_id)
     primary_branch = global_config.get("primary_branch", "main")
 
+    # A submission that failed as a whole (e.g. a compilation error on the judge) has no test results to check
+    if "error" in grouped_results:
+        telegram_bot.send_message(
+            chat_id,
+            f"⚠️ *Auto-Merge Skipped*\n"
+            f"Branch `{branch}` was not merged into `{primary_branch}` because the submission failed."
+        )
+        return
+
     try:
         # Step 1: Calculate the total number of tests and passed tests
-        total_tests = sum(len(group["tests"]) for group in grouped_results.values())
-        passed_tests = sum(
-            1 for group in grouped_results.values() for test in group["tests"] if test["result"].lower() == "ok"
-        )
+        total_tests = passed_tests = 0
+        for group in grouped_results.values():
+            total_tests += len(group.tests)
+            for test in group.tests:
+                passed_tests += test.passed
+
+        # Without any test results there is nothing that could justify the merge
+        if total_tests == 0:
+            telegram_bot.send_message(
+                chat_id,
+                f"⚠️ *Auto-Merge Skipped*\n"
+                f"Branch `{branch}` was not merged into `{primary_branch}` because no test results were reported."
+            )
+            return
 
         # Ensure all tests passed before proceeding with the merge
         if passed_tests != total_tests:
@@ -320,101 +697,37 @@ def perform_auto_merge(chat_id, branch, grouped_results, commit_hash, telegram_b
 
         test_summary = f"Tests Passed: {passed_tests}/{total_tests}"
 
-        # Step 2: Fetch the latest changes for the branch
-        fetch_failure_message = (
-            f"❌ *Auto-Merge Failed*\n"
-            f"Failed to fetch the latest changes for `{branch}`. Merge aborted."
-        )
-        execute_git_command(
-            chat_id,
-            ["fetch", "origin", branch],
-            telegram_bot,
-            fetch_failure_message
-        )
-
-        # Step 3: Reset the branch to the specified commit hash
-        reset_failure_message = (
-            f"❌ *Auto-Merge Failed*\n"
-            f"Failed to reset branch `{branch}` to commit `{commit_hash}`. Merge aborted."
-        )
-        execute_git_command(
-            chat_id,
-            ["checkout", "-B", branch, commit_hash],
-            telegram_bot,
-            reset_failure_message
-        )
-
-        # Step 4: Checkout the primary branch
-        checkout_failure_message = (
-            f"❌ *Auto-Merge Failed*\n"
-            f"Failed to checkout the primary branch `{primary_branch}`. Merge aborted."
-        )
-        execute_git_command(
-            chat_id,
-            ["checkout", primary_branch],
-            telegram_bot,
-            checkout_failure_message
-        )
-
-        # Step 5: Pull the latest changes for the primary branch
-        pull_failure_message = (
-            f"❌ *Auto-Merge Failed*\n"
-            f"Failed to pull the latest changes for `{primary_branch}`. Merge aborted."
-        )
-        execute_git_command(
-            chat_id,
-            ["pull", "origin", primary_branch],
-            telegram_bot,
-            pull_failure_message
-        )
-
-        # Step 6: Merge the branch into the primary branch with --no-commit and --no-ff
-        merge_failure_message = (
-            f"⚠️ *Merge Conflict Detected*\n"
-            f"Branch `{branch}` could not be merged into `{primary_branch}` due to conflicts."
-        )
+        # Step 2: Merge into the primary branch as of the last fetch, which is usually still up to date.
+        # The push is rejected if the remote branch has moved on since; then it is fetched and merged once more.
+        commit_message = f"Merge branch '{branch}' into `{primary_branch}`\n\n{test_summary}"
         try:
+            merged = merge_and_push(chat_id, branch, primary_branch, commit_hash, commit_message)
+        except RuntimeError:
+            merged = False
+
+        if not merged:
+            # Step 3: Fetch the latest state of the primary branch (only this branch's ref, without tags)
+            fetch_failure_message = (
+                f"❌ *Auto-Merge Failed*\n"
+                f"Failed to fetch the latest changes for `{primary_branch}`. Merge aborted."
+            )
             execute_git_command(
                 chat_id,
-                ["merge", "--no-commit", "--no-ff", branch],
+                ["fetch", "--no-tags", "--no-write-fetch-head", "origin", f"+refs/heads/{primary_branch}:refs/remotes/origin/{primary_branch}"],
                 telegram_bot,
-                merge_failure_message
+                fetch_failure_message
             )
-        except RuntimeError:
-            # Abort the merge in case of conflicts
-            abort_failure_message = (
-                f"❌ *Merge Aborted*\n"
-                f"Conflict resolution failed during the merge of `{branch}` into `{primary_branch}`."
-            )
-            execute_git_command(chat_id, ["merge", "--abort"], telegram_bot, abort_failure_message)
-            return
 
-        # Step 7: Commit the merge
-        commit_message = f"Merge branch '{branch}' into `{primary_branch}`\n\n{test_summary}"
-        commit_failure_message = (
-            f"❌ *Auto-Merge Failed*\n"
-            f"Failed to commit the merge changes for `{branch}` into `{primary_branch}`."
-        )
-        execute_git_command(
-            chat_id,
-            ["commit", "-m", commit_message],
-            telegram_bot,
-            commit_failure_message
-        )
-
-        # Step 8: Push the merged changes to the remote
-        push_failure_message = (
-            f"❌ *Push Failed*\n"
-            f"The merged changes for `{primary_branch}` could not be pushed to the remote."
-        )
-        execute_git_command(
-            chat_id,
-            ["push", "origin", primary_branch],
-            telegram_bot,
-            push_failure_message
-        )
+            # Step 4: Merge again on top of the fetched state
+            if not merge_and_push(chat_id, branch, primary_branch, commit_hash, commit_message, telegram_bot):
+                telegram_bot.send_message(
+                    chat_id,
+                    f"⚠️ *Merge Conflict Detected*\n"
+                    f"Branch `{branch}` could not be merged into `{primary_branch}` due to conflicts."
+                )
+                return
 
-        # Step 9: Notify user of successful merge
+        # Step 5: Notify user of successful merge
         telegram_bot.send_message(
             chat_id,
             f"✅ *Auto-Merge Successful*\n"
@@ -1,17 +1,110 @@
 import os
+import json
+import time
+import logging
 import tempfile
+import threading
 from zipfile import ZipFile
+from concurrent.futures import ThreadPoolExecutor
+from config.config import Config
 from handlers import LANGUAGE_HANDLERS
-from utils.file_operations import create_zip_files
-from handlers.base_handler import CompilationError
+from utils.file_operations import hash_zip_files, write_json_file
+from handlers.base_handler import CompilationError, CompilationResult
 from api.telegram import TelegramBot
 
+logger = logging.getLogger(__name__)
 
-def check_for_compiler_errors(chat_id, config, telegram_bot):
+COMPILE_CACHE_FILE = "data/compile_cache.json"  # File to map checked projects to their compilation outcome
+
+# Serializes read-modify-write cycles on the compile cache across threads
+COMPILE_CACHE_LOCK = threading.Lock()
+
+# Limits the compilers running at the same time across all chats, branches and projects
+COMPILE_SLOTS = threading.BoundedSemaphore(Config.MAX_PARALLEL_COMPILES)
+
+
+def load_compile_cache():
+    """
+    Load the compile cache, ordered from least to most recently used.
+    """
+    if not os.path.exists(COMPILE_CACHE_FILE):
+        return {}
+
+    with open(COMPILE_CACHE_FILE, "r") as f:
+        return json.load(f)
+
+
+def write_compile_cache(compile_cache):
+    """
+    Write the compile cache atomically, keeping only the most recently used entries.
+    """
+    while len(compile_cache) > Config.COMPILE_CACHE_SIZE:
+        del compile_cache[next(iter(compile_cache))]
+
+    write_json_file(COMPILE_CACHE_FILE, compile_cache, indent=None)
+
+
+def compile_project(handler, cache_key, zip_file, project_dir):
+    """
+    Extract and compile a project, or reuse the outcome of an identical project checked before.
+    Returns a CompilationResult or raises CompilationError, just like the language handler.
+    Unexpected errors (e.g. a missing compiler) are not cached.
+    The compiler only runs once one of the process-wide COMPILE_SLOTS is free.
+    """
+    with COMPILE_CACHE_LOCK:
+        compile_cache = load_compile_cache()
+        entry = compile_cache.pop(cache_key, None)
+        if entry and time.time() - entry["timestamp"] <= Config.COMPILE_CACHE_TTL.total_seconds():
+            # Move the entry to the end to mark it as most recently used
+            compile_cache[cache_key] = entry
+            write_compile_cache(compile_cache)
+        else:
+            entry = None
+
+    if entry:
+        if "error" in entry:
+            raise CompilationError(entry["error"])
+        return CompilationResult(warnings=entry["warnings"])
+
+    with ZipFile(zip_file, 'r') as zip_ref:
+        zip_ref.extractall(project_dir)
+
+    try:
+        with COMPILE_SLOTS:
+            result = handler.compile(project_dir)
+        entry = {"warnings": result.warnings, "timestamp": time.time()}
+    except CompilationError as e:
+        result = None
+        entry = {"error": str(e), "timestamp": time.time()}
+
+    with COMPILE_CACHE_LOCK:
+        compile_cache = load_compile_cache()
+        compile_cache.pop(cache_key, None)
+        compile_cache[cache_key] = entry
+        write_compile_cache(compile_cache)
+
+    if result is None:
+        raise CompilationError(entry["error"])
+    return result
+
+
+def check_project(handler, language, zip_name, zip_file, project_dir):
+    """
+    Compilation check of a single project, run in the compile pool.
+    """
+    cache_key = f"{language}:{hash_zip_files([(zip_name, zip_file)])}"
+    return compile_project(handler, cache_key, zip_file, project_dir)
+
+
+def check_for_compiler_errors(chat_id, config, zip_files, telegram_bot):
     """
     Run a compilation check for each project specified in the configuration.
     Uses language-specific handlers to process each project in a temporary directory. Handles errors and warnings based on configuration flags.
-    Creates ZIP files first, extracts them to temporary directories, and checks each project for compilation errors.
+    Extracts the given ZIP files (as returned by create_zip_files()) into a shared temporary directory and checks each project for compilation errors.
+    The ZIP files are left open, so the caller can submit the same archives afterwards.
+    The projects are independent, so they are checked at the same time; the number of compilers running
+    across the whole bot is limited to Config.MAX_PARALLEL_COMPILES.
+    Results are reported in configuration order; after the first failing project, checks that have not started yet are cancelled.
     """
     language = config.get("language")
     if not language:
@@ -20,7 +113,7 @@ def check_for_compiler_errors(chat_id, config, telegram_bot):
             "Please specify a language (e.g., 'rust', 'cpp').\n\n"
             f"🛠 Supported languages: {', '.join(LANGUAGE_HANDLERS.keys())}"
         )
-        print(message)
+        logger.warning(message)
         telegram_bot.send_message(chat_id, message)
         return False
 
@@ -30,61 +123,65 @@ def check_for_compiler_errors(chat_id, config, telegram_bot):
             f"🛠 Supported languages are: {', '.join(LANGUAGE_HANDLERS.keys())}.\n\n"
             "💡 If you need support for this language, please contact the bot administrator."
         )
-        print(message)
+        logger.warning(message)
         telegram_bot.send_message(chat_id, message)
         return False
 
     handler = LANGUAGE_HANDLERS[language]
-
-    zip_files, temp_dir = create_zip_files(config, chat_id)
     all_projects_meet_criteria = True
 
-    for zip_file in zip_files:
-        with tempfile.TemporaryDirectory() as temp_dir_extract:
+    # All projects are extracted into one temporary directory, which is removed in a single cleanup
+    # (only after the compile pool has finished all running checks)
+    with tempfile.TemporaryDirectory(prefix="cibot_") as temp_dir, \
+            ThreadPoolExecutor(max_workers=max(1, min(len(zip_files), Config.MAX_PARALLEL_COMPILES))) as compile_pool:
+        pending_checks = [
+            compile_pool.submit(check_project, handler, language, zip_name, zip_file, os.path.join(temp_dir, str(index)))
+            for index, (zip_name, zip_file) in enumerate(zip_files)
+        ]
+
+        for (zip_name, _), pending_check in zip(zip_files, pending_checks):
             try:
-                with ZipFile(zip_file, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir_extract)
-
-                try:
-                    result = handler.compile(temp_dir_extract)
-
-                    if result.warnings:
-                        warnings_text = "\n".join(result.warnings) if isinstance(result.warnings, list) else str(result.warnings)
-                        warning_message = (
-                            f"⚠️ *Warnings Detected in {TelegramBot.escape_markdown(os.path.basename(zip_file))}*\n\n"
-                            f"{TelegramBot.escape_markdown(warnings_text)}"
-                        )
-                        print(warning_message)
-                        telegram_bot.send_message(chat_id, warning_message, bypass_escaping=True)
-
-                        if not config.get("ALLOW_WARNINGS", False):
-                            all_projects_meet_criteria = False
-                            break
-
-                    print(f"✅ Compilation check completed successfully for {os.path.basename(zip_file)}.")
-
-                except CompilationError as e:
-                    error_message = (
-                        f"❌ *Compiler Errors Detected in {TelegramBot.escape_markdown(os.path.basename(zip_file))}*\n\n"
-                        f"{TelegramBot.escape_markdown(str(e))}"
+                result = pending_check.result()
+
+                if result.warnings:
+                    warnings_text = "\n".join(result.warnings) if isinstance(result.warnings, list) else str(result.warnings)
+                    warning_message = (
+                        f"⚠️ *Warnings Detected in {TelegramBot.escape_markdown(zip_name)}*\n\n"
+                        f"{TelegramBot.escape_markdown(warnings_text)}"
                     )
-                    print(error_message)
-                    telegram_bot.send_message(chat_id, error_message, bypass_escaping=True)
+                    logger.warning(warning_message)
+                    telegram_bot.send_message(chat_id, warning_message, bypass_escaping=True)
 
-                    if not config.get("ALLOW_ERRORS", False):
+                    if not config.get("ALLOW_WARNINGS", False):
                         all_projects_meet_criteria = False
                         break
 
+                logger.info(f"✅ Compilation check completed successfully for {zip_name}.")
+
+            except CompilationError as e:
+                error_message = (
+                    f"❌ *Compiler Errors Detected in {TelegramBot.escape_markdown(zip_name)}*\n\n"
+                    f"{TelegramBot.escape_markdown(str(e))}"
+                )
+                logger.warning(error_message)
+                telegram_bot.send_message(chat_id, error_message, bypass_escaping=True)
+
+                if not config.get("ALLOW_ERRORS", False):
+                    all_projects_meet_criteria = False
+                    break
+
             except Exception as e:
                 unexpected_error_message = (
                     f"❌ *Unexpected Error During Compilation Check*\n\n"
-                    f"Project: `{TelegramBot.escape_markdown(os.path.basename(zip_file))}`\n"
+                    f"Project: `{TelegramBot.escape_markdown(zip_name)}`\n"
                     f"Error: {TelegramBot.escape_markdown(str(e))}"
                 )
-                print(unexpected_error_message)
+                logger.error(unexpected_error_message)
                 telegram_bot.send_message(chat_id, unexpected_error_message, bypass_escaping=True)
                 all_projects_meet_criteria = False
                 break
 
-    temp_dir.cleanup()
+        for pending_check in pending_checks:
+            pending_check.cancel()
+
     return all_projects_meet_criteria
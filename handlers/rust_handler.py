@@ -1,3 +1,4 @@
+import json
 import subprocess
 from .base_handler import LanguageHandler, CompilationError, CompilationResult
 
@@ -5,14 +6,28 @@ from .base_handler import LanguageHandler, CompilationError, CompilationResult
 class RustHandler(LanguageHandler):
     @staticmethod
     def compile(temp_dir):
-        cmd = ["cargo", "check"]
+        # Diagnostics are read from cargo's JSON messages, so their severity does not have to be guessed from the text
+        cmd = ["cargo", "check", "--message-format=json"]
         result = subprocess.run(cmd, cwd=temp_dir, capture_output=True, text=True)
 
         warnings = []
-        if "warning" in result.stderr.lower():
-            warnings.append(result.stderr)
+        errors = []
+        for line in result.stdout.splitlines():
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("reason") != "compiler-message":
+                continue
+
+            diagnostic = message["message"]
+            if diagnostic["level"] == "warning":
+                warnings.append(diagnostic["rendered"])
+            elif diagnostic["level"] in ("error", "error: internal compiler error"):
+                errors.append(diagnostic["rendered"])
 
         if result.returncode != 0:
-            raise CompilationError(result.stderr)
+            # Errors outside the compiler (e.g. an invalid Cargo.toml) are only reported on stderr
+            raise CompilationError("".join(errors) or result.stderr)
 
         return CompilationResult(warnings=warnings)
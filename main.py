@@ -1,47 +1,34 @@
 import time
 import signal
+import logging
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from config.config import Config
-from git_manager.git_operations import (get_commit_message, load_last_commit, save_last_commit, fetch_all_branches, get_latest_commit, reset_to_commit, load_config_from_commit, get_tracked_branches, perform_auto_merge)
+from git_manager.git_operations import (get_commit_message, load_last_commit, save_last_commit, flush_last_commits, fetch_branches, get_changed_remote_branches, import_legacy_last_commits, get_all_latest_commits, load_config_from_commit, create_zip_files, close_object_readers, get_tracked_branches, get_merge_lock, perform_auto_merge)
 from api.oioioi import OioioiAPI
 from api.telegram import TelegramBot
-from utils.file_operations import create_zip_files, load_chat_config, save_chat_config, get_all_chat_configs
-from utils.system import handle_shutdown_signal, ShutdownSignal
+from utils.file_operations import close_zip_files, hash_zip_files, load_chat_config, save_chat_config, get_all_chat_configs
+from utils.system import handle_shutdown_signal, handle_wake_signal, ShutdownSignal, WakeSignal, WebhookServer, LogBuffer
 from handlers.compilation_manager import check_for_compiler_errors
 from datetime import datetime, timedelta
 from utils.user_message_handler import initialize_message_handlers, register_commands
 from telegram.ext import Application
-from utils.results_utils import send_results_summary_to_telegram
+from utils.results_utils import send_results_summary_to_telegram, load_judge_cache_entry, save_judge_cache_entry, is_final_result
+
+logger = logging.getLogger(__name__)
 
 # Global error tracker to handle backoff time for chat IDs
 error_tracker = {}
 
+# (chat_id, branch) pairs that have already been reported as missing
+missing_branches = set()
+
 
-def process_commit(chat_id, branch, current_commit, config, oioioi_api, telegram_bot):
+def submit_commit(chat_id, branch, current_commit, config, zip_files, judge_cache_key, oioioi_api, telegram_bot):
     """
-    Process a new commit: validate, compile, submit, and handle results.
+    Submit the ZIP files of a commit and record the submission as pending.
+    Runs on the submission worker of process_chat_id and releases the ZIP files when done.
     """
-    # Reset to the specific commit
-    reset_to_commit(chat_id, branch, current_commit, telegram_bot)
-
-    # Check for compiler errors
-    if not check_for_compiler_errors(chat_id, config, telegram_bot):
-        message = (
-            f"❌ *Compilation Failed*\n"
-            f"• *Branch*: `{branch}`\n"
-            f"• *Commit Hash*: `{current_commit}`\n"
-            f"• *Warnings Allowed*: {config.get('ALLOW_WARNINGS', False)}\n"
-            f"• *Errors Allowed*: {config.get('ALLOW_ERRORS', False)}\n"
-            f"Please review the compilation logs for more details."
-        )
-        print(message)
-        telegram_bot.send_message(chat_id, message)
-        return False
-
-    telegram_bot.send_message(chat_id, "✅ *Compilation Successful*")
-
-    # Create ZIP files for submission
-    zip_files, temp_dir = create_zip_files(config, chat_id)
     try:
         # Submit the solution
         submission_id = oioioi_api.submit_solution(chat_id, config["contest_id"], config["problem_short_name"], zip_files, branch, telegram_bot)
@@ -52,40 +39,126 @@ def process_commit(chat_id, branch, current_commit, config, oioioi_api, telegram
             new_pending_submissions.append({
                 "submission_id": submission_id,
                 "contest_id": config["contest_id"],
-                "commit_hash": current_commit
+                "commit_hash": current_commit,
+                "judge_cache_key": judge_cache_key
             })
             save_chat_config(chat_id, {"pending_submissions": new_pending_submissions})
 
             # Notify user about the submission
             telegram_bot.send_message(
                 chat_id,
-                "✅ *Submission Accepted*\n"
-                "Results will be checked periodically."
+                f"✅ *Submission Accepted*\n"
+                f"• *Branch*: `{branch}`\n"
+                f"• *Commit Hash*: `{current_commit[:7]}`\n"
+                f"Results will be checked periodically."
             )
     finally:
-        temp_dir.cleanup()
+        close_zip_files(zip_files)
 
-    return True
+
+def process_commit(chat_id, branch, current_commit, config, oioioi_api, telegram_bot, submission_worker):
+    """
+    Process a new commit: validate, compile, submit, and handle results.
+    The sources are read directly from the commit's objects, so the working tree is not checked out.
+    The upload is handed to `submission_worker`, so the next branch can be prepared
+    while the submission is still in flight. Returns the future of the submission, if any.
+    """
+    # The ZIP files are created once and used for both the compilation check and the submission
+    zip_files = create_zip_files(config, chat_id, current_commit)
+    try:
+        compilation_successful = check_for_compiler_errors(chat_id, config, zip_files, telegram_bot)
+    except Exception:
+        close_zip_files(zip_files)
+        raise
+
+    if not compilation_successful:
+        close_zip_files(zip_files)
+        message = (
+            f"❌ *Compilation Failed*\n"
+            f"• *Branch*: `{branch}`\n"
+            f"• *Commit Hash*: `{current_commit[:7]}`\n"
+            f"• *Warnings Allowed*: {config.get('ALLOW_WARNINGS', False)}\n"
+            f"• *Errors Allowed*: {config.get('ALLOW_ERRORS', False)}\n"
+            f"Please review the compilation logs for more details."
+        )
+        logger.warning(message)
+        telegram_bot.send_message(chat_id, message)
+        return None
+
+    telegram_bot.send_message(
+        chat_id,
+        f"✅ *Compilation Successful*\n"
+        f"• *Branch*: `{branch}`\n"
+        f"• *Commit Hash*: `{current_commit[:7]}`"
+    )
+
+    try:
+        # Reuse the results of an identical earlier submission instead of judging it again
+        judge_cache_key = f"{chat_id}:{config['contest_id']}:{config['problem_short_name']}:{hash_zip_files(zip_files)}"
+        cached_entry = load_judge_cache_entry(judge_cache_key)
+    except Exception:
+        close_zip_files(zip_files)
+        raise
+
+    if cached_entry:
+        close_zip_files(zip_files)
+        submission_id, results = cached_entry
+        telegram_bot.send_message(
+            chat_id,
+            f"♻️ *Identical Submission Found*\n"
+            f"• *Branch*: `{branch}`\n"
+            f"• *Commit Hash*: `{current_commit[:7]}`\n"
+            f"• *Submission ID*: `{submission_id}`\n"
+            f"Reusing its results instead of submitting again."
+        )
+        results_url = oioioi_api.get_results_url(config["contest_id"], submission_id)
+        send_results_summary_to_telegram(chat_id, config["contest_id"], results, results_url, telegram_bot)
+
+        # Perform auto-merge if configured
+        auto_merge_branch = config.get("auto_merge_branch")
+        if auto_merge_branch:
+            with get_merge_lock(chat_id):
+                perform_auto_merge(chat_id, auto_merge_branch, results, current_commit, telegram_bot)
+        return None
+
+    # The upload does not depend on any repository state, so it can overlap with the next branch
+    return submission_worker.submit(
+        submit_commit, chat_id, branch, current_commit, config, zip_files, judge_cache_key, oioioi_api, telegram_bot
+    )
 
 
 def process_pending_submissions(chat_id, oioioi_api, telegram_bot):
     """
     Process pending submissions for a given chat ID and handle auto-merge if configured.
+    Each submission is polled with exponential back-off, so long-running judgements are fetched less often.
     """
     user_config = load_chat_config(chat_id)
     pending_submissions = user_config.get("pending_submissions", [])
     completed_submissions = []
 
-    if pending_submissions and len(pending_submissions) > 0:
-        oioioi_api.login()
+    now = time.time()
+    due_submissions = [sub for sub in pending_submissions if sub.get("next_check", 0) <= now]
+    if not due_submissions:
+        return
+
+    oioioi_api.ensure_logged_in()
 
-    for submission in pending_submissions:
+    for submission in due_submissions:
         submission_id = submission["submission_id"]
         contest_id = submission["contest_id"]
         commit_hash = submission["commit_hash"]
 
         results = oioioi_api.fetch_test_results(contest_id, submission_id)
-        if results:
+        if not results:
+            # Back off before checking this submission again
+            poll_delay = submission.get("poll_delay", Config.RESULTS_POLL_INITIAL_DELAY)
+            submission["next_check"] = now + poll_delay
+            submission["poll_delay"] = min(poll_delay * 2, Config.RESULTS_POLL_MAX_DELAY)
+        else:
+            # Only complete test results are reused; failed submissions (e.g. judge errors) are judged again next time
+            if "judge_cache_key" in submission and "error" not in results and is_final_result(results):
+                save_judge_cache_entry(submission["judge_cache_key"], submission_id, results)
+
             # Notify user about the results
             results_url = oioioi_api.get_results_url(contest_id, submission_id)
             send_results_summary_to_telegram(chat_id, contest_id, results, results_url, telegram_bot)
@@ -96,14 +169,15 @@ def process_pending_submissions(chat_id, oioioi_api, telegram_bot):
             except FileNotFoundError:
                 telegram_bot.send_message(
                     chat_id,
-                    f"⚠️ *Auto-Merge Skipped*: Missing submission_config.json for commit `{commit_hash}`."
+                    f"⚠️ *Auto-Merge Skipped*: Missing submission_config.json for commit `{commit_hash[:7]}`."
                 )
                 continue
 
             # Perform auto-merge if configured
             branch = submission_config.get("auto_merge_branch")
             if branch:
-                perform_auto_merge(chat_id, branch, results, commit_hash, telegram_bot)
+                with get_merge_lock(chat_id):
+                    perform_auto_merge(chat_id, branch, results, commit_hash, telegram_bot)
 
             completed_submissions.append(submission)
 
@@ -115,14 +189,21 @@ def process_pending_submissions(chat_id, oioioi_api, telegram_bot):
     save_chat_config(chat_id, {"pending_submissions": new_pending_submissions})
 
 
-def process_branch(chat_id, branch, user_config, oioioi_api, telegram_bot):
+def process_branch(chat_id, branch, current_commit, user_config, oioioi_api, telegram_bot, submission_worker):
     """
     Process a branch for a specific user.
+    Returns the future of a started submission, if any.
     """
-    last_commit = load_last_commit(chat_id, branch)
-    current_commit = get_latest_commit(chat_id, branch, telegram_bot)
+    if not current_commit:
+        # Only warn when the branch goes missing, not on every check
+        if (chat_id, branch) not in missing_branches:
+            missing_branches.add((chat_id, branch))
+            telegram_bot.send_message(chat_id, f"⚠️ *Git Warning: Branch Missing*\nBranch: `{branch}` is unavailable.")
+        return
+    missing_branches.discard((chat_id, branch))
 
-    if not current_commit or current_commit == last_commit:
+    last_commit = load_last_commit(chat_id, branch)
+    if current_commit == last_commit:
         return  # No new commit
 
     save_last_commit(chat_id, branch, current_commit)
@@ -132,7 +213,7 @@ def process_branch(chat_id, branch, user_config, oioioi_api, telegram_bot):
         chat_id,
         f"🚨 *New Commit Detected*\n"
         f"• *Branch*: `{branch}`\n"
-        f"• *Commit Hash*: `{current_commit}`\n"
+        f"• *Commit Hash*: `{current_commit[:7]}`\n"
         f"• *Message*: {commit_message}"
     )
 
@@ -144,17 +225,18 @@ def process_branch(chat_id, branch, user_config, oioioi_api, telegram_bot):
             f"⚠️ *Skipping Submission*\n"
             f"• *Reason*: AUTOCOMMIT is disabled or config is missing.\n"
             f"• *Branch*: `{branch}`\n"
-            f"• *Commit Hash*: `{current_commit}`"
+            f"• *Commit Hash*: `{current_commit[:7]}`"
         )
         return
 
     # Process the commit
-    process_commit(chat_id, branch, current_commit, config, oioioi_api, telegram_bot)
+    return process_commit(chat_id, branch, current_commit, config, oioioi_api, telegram_bot, submission_worker)
 
 
-def process_chat_id(chat_id, oioioi_api, telegram_bot):
+def process_chat_id(chat_id, oioioi_api, telegram_bot, check_remote=True):
     """
     Process all tasks for a single chat ID.
+    With check_remote=False the remote is not contacted for new commits; only pending submissions are processed.
     """
     global error_tracker
     now = datetime.now()
@@ -170,12 +252,30 @@ def process_chat_id(chat_id, oioioi_api, telegram_bot):
         if not user_config:
             raise ValueError(f"No configuration found for chat ID: {chat_id}")
 
-        # Check for new commits
-        fetch_all_branches(chat_id, telegram_bot)
-        branches_to_check = get_tracked_branches(chat_id, telegram_bot)
+        # Check for new commits, only fetching the remote branches that have actually moved
+        latest_commits = get_all_latest_commits(chat_id, telegram_bot)
+        changed_branches = get_changed_remote_branches(chat_id, latest_commits, telegram_bot) if check_remote else []
+        if changed_branches:
+            fetch_branches(chat_id, changed_branches, telegram_bot)
+            latest_commits = get_all_latest_commits(chat_id, telegram_bot)
+        branches_to_check = get_tracked_branches(chat_id, latest_commits, telegram_bot)
+
+        # Branches are prepared concurrently (sources are read from Git objects and auto-merges are serialized),
+        # while their uploads run one after another on a single submission worker
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"submit-{chat_id}") as submission_worker, \
+                ThreadPoolExecutor(max_workers=Config.MAX_PARALLEL_BRANCHES, thread_name_prefix=f"branch-{chat_id}") as branch_pool:
+            branch_tasks = [
+                branch_pool.submit(
+                    process_branch, chat_id, branch, latest_commits.get(branch), user_config, oioioi_api, telegram_bot, submission_worker
+                )
+                for branch in branches_to_check
+            ]
+            submissions = [branch_task.result() for branch_task in branch_tasks]
 
-        for branch in branches_to_check:
-            process_branch(chat_id, branch, user_config, oioioi_api, telegram_bot)
+        # Propagate errors raised during submission
+        for submission in submissions:
+            if submission:
+                submission.result()
 
         # Process pending submissions
         process_pending_submissions(chat_id, oioioi_api, telegram_bot)
@@ -191,30 +291,81 @@ def process_chat_id(chat_id, oioioi_api, telegram_bot):
         error_tracker[chat_id] = (now, str(e))
 
 
+def run_chat_tasks(chat_id, oioioi_api, telegram_bot, check_remote):
+    """
+    Run the CI tasks of a single chat ID in a worker thread and report unexpected errors.
+    """
+    try:
+        process_chat_id(chat_id, oioioi_api, telegram_bot, check_remote)
+    except Exception as e:
+        telegram_bot.send_message(
+            chat_id, f"❌ *Error Processing User*\n{str(e)}"
+        )
+
+
 async def ci_task_loop():
     """
     CI Task Loop: Periodically processes CI-related tasks for all chat IDs.
+    Chat IDs are processed concurrently in a bounded thread pool. Each chat has its own repository,
+    whose branches are in turn processed concurrently; auto-merges into the primary branch are serialized.
     """
     telegram_bot = TelegramBot(Config.TELEGRAM_BOT_TOKEN)
+    oioioi_apis = {}  # One API client (and HTTP session) per chat ID, kept across iterations
+    executor = ThreadPoolExecutor(max_workers=Config.MAX_PARALLEL_CHATS, thread_name_prefix="ci-worker")
+    loop = asyncio.get_running_loop()
+    WakeSignal.attach()
+    WebhookServer.start()
+    import_legacy_last_commits()
 
     print("▶️ CI Task Loop started.")
 
+    last_remote_check = None
     while not ShutdownSignal.flag:
+        # Without a webhook endpoint the remotes are polled on every iteration
+        check_remote = WebhookServer.remotes_need_check(last_remote_check)
+        if check_remote:
+            last_remote_check = time.monotonic()
+
         # Perform CI tasks
         all_chat_configs = get_all_chat_configs()
         chat_ids = all_chat_configs.keys()
 
+        # Drop API clients of chats that have been deleted in the meantime
+        for stale_chat_id in set(oioioi_apis) - set(chat_ids):
+            oioioi_apis.pop(stale_chat_id).session.close()
+
+        chat_tasks = []
         for chat_id in chat_ids:
             try:
-                oioioi_api = OioioiAPI(chat_id)
-                process_chat_id(chat_id, oioioi_api, telegram_bot)
+                oioioi_api = oioioi_apis.get(chat_id)
+                if oioioi_api is None:
+                    oioioi_api = oioioi_apis[chat_id] = OioioiAPI(chat_id)
+                else:
+                    oioioi_api.load_credentials()
             except Exception as e:
                 telegram_bot.send_message(
                     chat_id, f"❌ *Error Processing User*\n{str(e)}"
                 )
+                continue
+            chat_tasks.append(loop.run_in_executor(executor, run_chat_tasks, chat_id, oioioi_api, telegram_bot, check_remote))
 
-        await asyncio.sleep(Config.CHECK_INTERVAL)
+        # Wait for all chats without blocking the event loop (and thereby the Telegram bot)
+        await asyncio.gather(*chat_tasks)
+
+        # Persist the processed commits of this iteration in a single write
+        flush_last_commits()
+        LogBuffer.flush()
+
+        # Sleep until the next check is due or the loop is woken up early (SIGUSR1, webhook or shutdown)
+        await WakeSignal.wait(Config.CHECK_INTERVAL)
     
+    # Deliver all queued notifications before exiting
+    WebhookServer.stop()
+    executor.shutdown(wait=True)
+    flush_last_commits()
+    close_object_readers()
+    telegram_bot.close()
+    LogBuffer.flush()
     print("⏹️ CI Task Loop stopped.")
 
 
@@ -257,6 +408,10 @@ if __name__ == "__main__":
     # Register signal handlers
     signal.signal(signal.SIGINT, handle_shutdown_signal)  # Ctrl+C
     signal.signal(signal.SIGTERM, handle_shutdown_signal)  # Termination signal
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, handle_wake_signal)  # Trigger an immediate CI check
+
+    LogBuffer.attach()
 
     print("Starting Telegram-Bot and CI tasks. Press Ctrl+C to stop.")
     asyncio.run(main())
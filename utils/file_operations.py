@@ -1,11 +1,20 @@
 import os
 import json
-import tempfile
+import logging
+import hashlib
+import functools
+import threading
 from zipfile import ZipFile
+from config.config import Config
 
 # Define the path for the central configuration file
 CONFIG_FILE_PATH = "data/config.json"
 
+logger = logging.getLogger(__name__)
+
+# Serializes read-modify-write cycles on the central configuration file across threads
+CONFIG_FILE_LOCK = threading.RLock()
+
 # Ensure the data directory exists
 os.makedirs(os.path.dirname(CONFIG_FILE_PATH), exist_ok=True)
 
@@ -25,22 +34,158 @@ def get_repo_path(chat_id):
     return os.path.join(get_chat_dir(chat_id), "repo")
 
 
+def write_json_file(path, data, indent=4, sync=False):
+    """
+    Write JSON data to a file atomically.
+    The data is written to a temporary file first, so readers never see a partially written file.
+    With sync=True the data is flushed to disk before the file is replaced.
+    """
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(data, file, indent=indent)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class JsonJournal:
+    """
+    A mapping persisted as an append-only JSON Lines file. Every update appends one `[key, value]` line,
+    so the file never has to be rewritten as a whole; when the same key is recorded again, the last line wins.
+    A value of null removes the key.
+    Once the file holds more than Config.JOURNAL_COMPACTION_FACTOR lines per live key, it is rewritten as a snapshot.
+    Keys are tuples of strings. The mapping is read once and then kept in memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.line_count = 0
+
+    def _load(self):
+        """
+        Replay the journal into memory. Must be called with the lock held.
+        """
+        if self.data is not None:
+            return
+
+        self.data = {}
+        self.line_count = 0
+        damaged = False
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        key, value = json.loads(line)
+                    except ValueError:
+                        # A line that was only partially written before a crash
+                        damaged = True
+                        continue
+                    if value is None:
+                        self.data.pop(tuple(key), None)
+                    else:
+                        self.data[tuple(key)] = value
+                    self.line_count += 1
+        except FileNotFoundError:
+            pass
+
+        if damaged:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rewrite the journal with one line per live key. Must be called with the lock held.
+        """
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            for key, value in self.data.items():
+                f.write(json.dumps([list(key), value]) + "\n")
+        os.replace(temp_path, self.path)
+        self.line_count = len(self.data)
+
+    def items(self):
+        """
+        Return a snapshot of all (key, value) pairs.
+        """
+        with self.lock:
+            self._load()
+            return list(self.data.items())
+
+    def get(self, key, default=None):
+        with self.lock:
+            self._load()
+            return self.data.get(key, default)
+
+    def _append(self, key, value):
+        """
+        Append a single line to the journal, compacting it if needed. Must be called with the lock held.
+        """
+        with open(self.path, "a") as f:
+            f.write(json.dumps([list(key), value]) + "\n")
+        self.line_count += 1
+
+        if self.line_count > Config.JOURNAL_COMPACTION_FACTOR * max(len(self.data), Config.JOURNAL_MIN_SIZE):
+            self._compact()
+
+    def set(self, key, value):
+        """
+        Record the value of a key by appending a single line. Nothing is written if the value is unchanged.
+        """
+        with self.lock:
+            self._load()
+            if self.data.get(key) == value:
+                return
+            self.data[key] = value
+            self._append(key, value)
+
+    def delete(self, key):
+        """
+        Remove a key by appending a single null line.
+        """
+        with self.lock:
+            self._load()
+            if self.data.pop(key, None) is not None:
+                self._append(key, None)
+
+    def sync(self):
+        """
+        Flush all lines appended so far to disk.
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                fd = os.open(self.path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def update(self, entries):
+        """
+        Record several key/value pairs, e.g. when importing existing data.
+        """
+        with self.lock:
+            self._load()
+            self.data.update(entries)
+            self._compact()
+
+
 # Centralized Configuration Management
 def save_chat_config(chat_id, config_data):
     """
     Save configuration data for a specific chat ID.
     If the central JSON file does not exist, it will be created.
     """
-    # Load existing data
-    existing_data = get_all_chat_configs()
+    with CONFIG_FILE_LOCK:
+        # Load existing data
+        existing_data = get_all_chat_configs()
 
-    # Update or add the chat-specific configuration
-    existing_data[str(chat_id)] = existing_data.get(str(chat_id), {})
-    existing_data[str(chat_id)].update(config_data)
+        # Update or add the chat-specific configuration
+        existing_data[str(chat_id)] = existing_data.get(str(chat_id), {})
+        existing_data[str(chat_id)].update(config_data)
 
-    # Save the updated data back to the JSON file
-    with open(CONFIG_FILE_PATH, "w") as file:
-        json.dump(existing_data, file, indent=4)
+        # Save the updated data back to the JSON file
+        write_json_file(CONFIG_FILE_PATH, existing_data)
 
 
 def load_chat_config(chat_id):
@@ -68,11 +213,11 @@ def delete_chat_config(chat_id):
     """
     Delete configuration data for a specific chat ID.
     """
-    all_configs = get_all_chat_configs()
-    if str(chat_id) in all_configs:
-        del all_configs[str(chat_id)]
-        with open(CONFIG_FILE_PATH, "w") as file:
-            json.dump(all_configs, file, indent=4)
+    with CONFIG_FILE_LOCK:
+        all_configs = get_all_chat_configs()
+        if str(chat_id) in all_configs:
+            del all_configs[str(chat_id)]
+            write_json_file(CONFIG_FILE_PATH, all_configs)
 
 
 def delete_old_auth_data(chat_id):
@@ -99,57 +244,51 @@ def delete_old_auth_data(chat_id):
     save_chat_config(chat_id, current_config)
 
 
-def create_zip_files(config, chat_id):
-    """
-    Create multiple ZIP files based on the `zip_files` configuration provided.
-    Allows specifying destination paths for files and folders within the ZIP.
-    Returns a list of created ZIP file paths and the temporary directory used.
-
-    Parameters:
-        config (dict): Configuration dictionary containing "zip_files".
-        chat_id (int or str): Chat ID to determine the repository path.
-    """
-    # Get the repository path using the chat ID
-    repo_path = get_repo_path(chat_id)
-
-    zip_files = config.get("zip_files", [])
-    temp_dir = tempfile.TemporaryDirectory()  # Create a temporary directory for ZIP files
-    created_files = []
-
-    for zip_config in zip_files:
-        zip_name = zip_config.get("zip_name", "submission.zip")
-        include_paths = zip_config.get("include_paths", [])
-        zip_path = os.path.join(temp_dir.name, zip_name)  # Place ZIP files in the temp directory
-
-        with ZipFile(zip_path, 'w') as zipf:
-            for path_mapping in include_paths:
-                source_path = os.path.join(repo_path, os.path.normpath(path_mapping["source"]))
-                destination_path = os.path.normpath(path_mapping["destination"])
-
-                # Verify that each path is within the repository and not a symlink
-                if not source_path.startswith(repo_path) or os.path.islink(source_path):
-                    print(f"Skipping unsafe or invalid path: '{source_path}'")
-                    continue
-
-                # If the path is a file, add it directly to the specified destination
-                if os.path.isfile(source_path):
-                    zipf.write(source_path, destination_path)
-
-                # If the path is a directory, walk through and add all files to the destination folder
-                elif os.path.isdir(source_path):
-                    for root, _, files in os.walk(source_path):
-                        if os.path.islink(root):
-                            print(f"Skipping symlinked directory: '{root}'")
-                            continue
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            if not os.path.islink(file_path):
-                                # Compute the relative path to preserve folder structure
-                                relative_path = os.path.relpath(file_path, source_path)
-                                zipf.write(file_path, os.path.join(destination_path, relative_path))
-                else:
-                    print(f"Warning: Path '{source_path}' not found in the repository.")
-
-        created_files.append(zip_path)
-
-    return created_files, temp_dir
+@functools.lru_cache(maxsize=128)
+def resolve_include_paths(path_mappings):
+    """
+    Normalize the (source, destination) path mappings of a ZIP configuration.
+    Sources are relative to the repository root; sources that point outside the repository are dropped.
+    The result is memoized, since every check and submission of the same configuration resolves the same mappings.
+    """
+    resolved_paths = []
+
+    for source, destination in path_mappings:
+        source_path = os.path.normpath(source)
+
+        # Verify that each path is within the repository
+        if os.path.isabs(source_path) or source_path == os.pardir or source_path.startswith(os.pardir + os.sep):
+            logger.warning(f"Skipping unsafe or invalid path: '{source}'")
+            continue
+
+        resolved_paths.append((source_path, os.path.normpath(destination)))
+
+    return tuple(resolved_paths)
+
+
+def close_zip_files(zip_files):
+    """
+    Release the ZIP files returned by create_zip_files() (see git_manager.git_operations).
+    """
+    for _, zip_file in zip_files:
+        zip_file.close()
+
+
+def hash_zip_files(zip_files):
+    """
+    Compute a SHA-256 hash over the names and contents of all files inside the given ZIP files.
+    File timestamps are ignored, so identical sources always produce the same hash.
+    Each member is hashed in chunks as it is read, so no file has to be held in memory as a whole.
+    """
+    digest = hashlib.sha256()
+    for zip_name, zip_file in zip_files:
+        with ZipFile(zip_file, 'r') as zipf:
+            digest.update(zip_name.encode() + b"\0")
+            for info in sorted(zipf.infolist(), key=lambda entry: entry.filename):
+                digest.update(info.filename.encode() + b"\0")
+                with zipf.open(info) as member:
+                    member_digest = hashlib.sha256()
+                    for chunk in iter(lambda: member.read(1 << 20), b""):
+                        member_digest.update(chunk)
+                    digest.update(member_digest.digest())
+    return digest.hexdigest()
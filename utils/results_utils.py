@@ -2,8 +2,201 @@ import re
 import time
 import os
 import json
+import threading
+from config.config import Config
+from utils.file_operations import write_json_file, JsonJournal
 
-SUBMISSION_HISTORY_FILE = "data/submission_history.json"  # File to store submission history
+SUBMISSION_HISTORY_FILE = "data/submission_history.jsonl"  # Journal of the latest results per chat and contest
+LEGACY_SUBMISSION_HISTORY_FILE = "data/submission_history.json"  # Former single-document format, imported on first use
+RESULTS_CACHE_DIR = "data/results_cache"  # Directory to store final results per submission
+JUDGE_CACHE_FILE = "data/judge_cache.json"  # File to map submitted sources to their results
+
+# Serialize read-modify-write cycles on the shared JSON files across threads
+SUBMISSION_HISTORY_LOCK = threading.Lock()
+JUDGE_CACHE_LOCK = threading.Lock()
+
+submission_history = JsonJournal(SUBMISSION_HISTORY_FILE)
+
+# Strips everything except digits, dots and slashes from a table cell
+NUMERIC_CLEANUP_PATTERN = re.compile(r"[^\d./]")
+
+
+class TestResult:
+    """
+    A single row of an OIOIOI results table.
+    The runtime is kept as a float (seconds) and only formatted when building messages.
+    Whether the test passed is determined once on construction.
+    """
+    __slots__ = ("test_name", "result", "runtime", "passed")
+
+    def __init__(self, test_name, result, runtime=0.0):
+        self.test_name = test_name
+        self.result = result
+        self.runtime = runtime
+        self.passed = result.lower() == "ok"
+
+    def to_dict(self):
+        """
+        Serialize the test result into the format stored in the submission history.
+        """
+        return {
+            "test_name": self.test_name,
+            "result": self.result,
+            "runtime": f"{self.runtime:.2f}s",
+        }
+
+
+class TestGroup:
+    """
+    All test results sharing the same group key, together with the summed group score.
+    """
+    __slots__ = ("tests", "total_score")
+
+    def __init__(self, tests=None, total_score=0.0):
+        self.tests = tests or []
+        self.total_score = total_score
+
+
+def grouped_results_to_dict(grouped_results):
+    """
+    Convert grouped results into a JSON-serializable dictionary.
+    """
+    if "error" in grouped_results:
+        return {"error": grouped_results["error"]}
+
+    return {
+        str(group): {
+            "tests": [[test.test_name, test.result, test.runtime] for test in data.tests],
+            "total_score": data.total_score,
+        }
+        for group, data in grouped_results.items()
+    }
+
+
+def grouped_results_from_dict(data):
+    """
+    Rebuild grouped results from a dictionary created by `grouped_results_to_dict`.
+    """
+    if "error" in data:
+        return {"error": data["error"]}
+
+    return {
+        int(group) if group.isdigit() else group: TestGroup(
+            [TestResult(*test) for test in group_data["tests"]],
+            group_data["total_score"]
+        )
+        for group, group_data in data.items()
+    }
+
+
+def is_final_result(grouped_results):
+    """
+    Check whether the grouped results are final, i.e. an error report or every test has a result.
+    """
+    if "error" in grouped_results:
+        return True
+    return all(test.result for data in grouped_results.values() for test in data.tests)
+
+
+def get_results_cache_path(contest_id, submission_id):
+    """
+    Get the cache file path for the results of a specific submission.
+    """
+    return os.path.join(RESULTS_CACHE_DIR, f"{contest_id}_{submission_id}.json")
+
+
+def load_cached_results(contest_id, submission_id):
+    """
+    Load the cached final results for a submission.
+    Returns None if the submission has not been cached yet.
+    """
+    cache_path = get_results_cache_path(contest_id, submission_id)
+    try:
+        with open(cache_path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    # Mark the entry as recently used for the LRU eviction
+    os.utime(cache_path)
+    return grouped_results_from_dict(data)
+
+
+def save_cached_results(contest_id, submission_id, grouped_results):
+    """
+    Cache the final results for a submission on disk and evict the least recently used entries.
+    The file is written atomically so concurrent readers never see a partial file.
+    """
+    os.makedirs(RESULTS_CACHE_DIR, exist_ok=True)
+    cache_path = get_results_cache_path(contest_id, submission_id)
+    write_json_file(cache_path, grouped_results_to_dict(grouped_results), indent=None)
+
+    cache_files = [
+        os.path.join(RESULTS_CACHE_DIR, name) for name in os.listdir(RESULTS_CACHE_DIR) if name.endswith(".json")
+    ]
+    if len(cache_files) > Config.RESULTS_CACHE_SIZE:
+        cache_files.sort(key=os.path.getmtime)
+        for path in cache_files[:len(cache_files) - Config.RESULTS_CACHE_SIZE]:
+            os.remove(path)
+
+
+def load_judge_cache():
+    """
+    Load the judge cache, ordered from least to most recently used.
+    """
+    if not os.path.exists(JUDGE_CACHE_FILE):
+        return {}
+
+    with open(JUDGE_CACHE_FILE, "r") as f:
+        return json.load(f)
+
+
+def write_judge_cache(judge_cache):
+    """
+    Write the judge cache atomically, keeping only the most recently used entries.
+    """
+    while len(judge_cache) > Config.JUDGE_CACHE_SIZE:
+        del judge_cache[next(iter(judge_cache))]
+
+    write_json_file(JUDGE_CACHE_FILE, judge_cache, indent=None)
+
+
+def load_judge_cache_entry(cache_key):
+    """
+    Look up the results of an earlier submission with identical sources.
+    Returns a (submission_id, grouped_results) tuple, or None if there is no entry or it has expired.
+    """
+    with JUDGE_CACHE_LOCK:
+        judge_cache = load_judge_cache()
+        entry = judge_cache.pop(cache_key, None)
+        if not entry:
+            return None
+
+        # Expired entries and failed submissions cached by earlier versions are dropped
+        if time.time() - entry["timestamp"] > Config.JUDGE_CACHE_TTL.total_seconds() or "error" in entry["grouped_results"]:
+            write_judge_cache(judge_cache)
+            return None
+
+        # Move the entry to the end to mark it as most recently used
+        judge_cache[cache_key] = entry
+        write_judge_cache(judge_cache)
+    return entry["submission_id"], grouped_results_from_dict(entry["grouped_results"])
+
+
+def save_judge_cache_entry(cache_key, submission_id, grouped_results):
+    """
+    Remember the results of a submission, so identical sources do not have to be judged again.
+    Only complete test results should be cached, not errors of a failed submission.
+    """
+    with JUDGE_CACHE_LOCK:
+        judge_cache = load_judge_cache()
+        judge_cache.pop(cache_key, None)
+        judge_cache[cache_key] = {
+            "submission_id": submission_id,
+            "grouped_results": grouped_results_to_dict(grouped_results),
+            "timestamp": time.time(),
+        }
+        write_judge_cache(judge_cache)
 
 
 def parse_numeric_value(value):
@@ -11,14 +204,14 @@ def parse_numeric_value(value):
     Extract the numeric part from a string value.
     Removes non-numeric characters like 's' or spaces.
     """
+    # Remove non-numeric characters except dots and slashes, and keep the part before a slash ("0.00 / 120.00")
+    cleaned_value = NUMERIC_CLEANUP_PATTERN.sub("", value).partition("/")[0]
+    if not cleaned_value:
+        return 0.0  # Nothing numeric, e.g. an empty cell
+
     try:
-        # Remove non-numeric characters except dots and slashes
-        cleaned_value = re.sub(r"[^\d./]", "", value.strip())
-        # Handle cases like "0.00 / 120.00"
-        if "/" in cleaned_value:
-            cleaned_value = cleaned_value.split("/")[0]
         return float(cleaned_value)
-    except (ValueError, IndexError):
+    except ValueError:
         return 0.0  # Return 0.0 if conversion fails
 
 
@@ -37,7 +230,7 @@ def format_results_message(grouped_results, results_url):
     messages = []
 
     # Header with overall information
-    total_score = sum(data["total_score"] for data in grouped_results.values())
+    total_score = sum(data.total_score for data in grouped_results.values())
     header = f"✅ *Test Results Overview*\n\n" \
              f"• Total Groups: {len(grouped_results)}\n" \
              f"• Overall Score: {total_score:.2f}\n\n" \
@@ -47,17 +240,14 @@ def format_results_message(grouped_results, results_url):
     # Detailed results per group
     for group, data in sorted(grouped_results.items()):
         group_message = f"📂 *Group {group}*\n" \
-                        f"• Total Group Score: {data['total_score']:.2f}\n\n"
+                        f"• Total Group Score: {data.total_score:.2f}\n\n"
 
-        for test in data["tests"]:
+        for test in data.tests:
             # Highlight successful tests in green and failed tests in red
-            test_status = "🟢" if test["result"].lower() == "ok" else "⚪️" if test["result"].lower() == "skipped" else "🔴"
-
-            # Ensure the runtime format is consistent (removing unnecessary newlines)
-            runtime = test["runtime"].replace("\n", " ").strip()
+            test_status = "🟢" if test.passed else "⚪️" if test.result.lower() == "skipped" else "🔴"
 
             group_message += (
-                f"{test_status} *{test['test_name']}* | ⏱ {runtime} | Result: {test['result']}\n"
+                f"{test_status} *{test.test_name}* | ⏱ {test.runtime:.2f}s | Result: {test.result}\n"
             )
 
         if group_message:
@@ -84,13 +274,19 @@ def compare_results(chat_id, contest_id, grouped_results):
     if "error" in grouped_results:
         return f"❌ *Submission Failed*: {grouped_results['error']}"
 
-    # Process normal test results
-    current_successful = sum(
-        1 for group in grouped_results.values() for test in group["tests"] if test["result"].lower() == "ok"
-    )
-    current_runtime = sum(
-        parse_numeric_value(test["runtime"]) for group in grouped_results.values() for test in group["tests"]
-    )
+    # Process normal test results in a single pass: totals plus the last solved test of each group
+    current_successful = 0
+    current_runtime = 0.0
+    last_solved_tests = {}
+    for group, data in grouped_results.items():
+        last_solved_test = None
+        for test in data.tests:
+            current_runtime += test.runtime
+            if test.passed:
+                current_successful += 1
+                if last_solved_test is None or test.test_name > last_solved_test.test_name:
+                    last_solved_test = test
+        last_solved_tests[group] = last_solved_test
 
     summary = []
     test_group_changes = []
@@ -116,45 +312,38 @@ def compare_results(chat_id, contest_id, grouped_results):
         summary.append(f"• *Runtime*: {'Faster' if diff_runtime < 0 else 'Slower'} by {abs(diff_runtime):.2f}s")
 
         # Compare the last solved test in each group
-        for group, current_group_data in grouped_results.items():
-            current_tests = current_group_data["tests"]
-            last_solved_test = max(
-                (test for test in current_tests if test["result"].lower() == "ok"),
-                key=lambda x: x["test_name"],
-                default=None
-            )
-
+        for group, last_solved_test in last_solved_tests.items():
             # Check if this group existed in the previous results
             if str(group) in prev_group_results:
                 prev_last_solved_test = prev_group_results[str(group)]["last_solved_test"]
 
                 # Check cases for improvement, regression, or no changes
                 if last_solved_test and prev_last_solved_test:
-                    if last_solved_test["test_name"] == prev_last_solved_test["test_name"]:
+                    if last_solved_test.test_name == prev_last_solved_test["test_name"]:
                         # Same last solved test: Compare runtime
-                        prev_runtime = parse_numeric_value(prev_last_solved_test["runtime"])
-                        current_runtime = parse_numeric_value(last_solved_test["runtime"])
+                        prev_test_runtime = parse_numeric_value(prev_last_solved_test["runtime"])
+                        current_test_runtime = last_solved_test.runtime
 
-                        if current_runtime < prev_runtime:
+                        if current_test_runtime < prev_test_runtime:
                             runtime_status = "🟢 Faster"
-                        elif current_runtime > prev_runtime:
+                        elif current_test_runtime > prev_test_runtime:
                             runtime_status = "🔴 Slower"
                         else:
                             runtime_status = "🟡 No Change"
 
                         test_group_changes.append(
-                            f"🟡 Group {group}: Same last solved test `{last_solved_test['test_name']}`.\n"
-                            f"   Runtime comparison: {runtime_status} ({prev_runtime:.2f}s → {current_runtime:.2f}s)"
+                            f"🟡 Group {group}: Same last solved test `{last_solved_test.test_name}`.\n"
+                            f"   Runtime comparison: {runtime_status} ({prev_test_runtime:.2f}s → {current_test_runtime:.2f}s)"
                         )
-                    elif last_solved_test["test_name"] > prev_last_solved_test["test_name"]:
+                    elif last_solved_test.test_name > prev_last_solved_test["test_name"]:
                         test_group_changes.append(
                             f"🟢 Group {group}: Improved. "
-                            f"Last solved test: `{prev_last_solved_test['test_name']}` → `{last_solved_test['test_name']}`"
+                            f"Last solved test: `{prev_last_solved_test['test_name']}` → `{last_solved_test.test_name}`"
                         )
                     else:
                         test_group_changes.append(
                             f"🔴 Group {group}: Regressed. "
-                            f"Last solved test: `{prev_last_solved_test['test_name']}` → `{last_solved_test['test_name']}`"
+                            f"Last solved test: `{prev_last_solved_test['test_name']}` → `{last_solved_test.test_name}`"
                         )
                 elif not last_solved_test and not prev_last_solved_test:
                     # No tests solved in either the current or previous submission
@@ -164,7 +353,7 @@ def compare_results(chat_id, contest_id, grouped_results):
                 elif last_solved_test:
                     # New tests solved in this submission but none previously
                     test_group_changes.append(
-                        f"🟢 Group {group}: Improved. Last solved test: `{last_solved_test['test_name']}`"
+                        f"🟢 Group {group}: Improved. Last solved test: `{last_solved_test.test_name}`"
                     )
                 else:
                     # No tests solved in this submission but there were previously
@@ -175,7 +364,7 @@ def compare_results(chat_id, contest_id, grouped_results):
                 # No previous data for this group
                 if last_solved_test:
                     test_group_changes.append(
-                        f"🟢 Group {group}: New group solved. Last solved test: `{last_solved_test['test_name']}`"
+                        f"🟢 Group {group}: New group solved. Last solved test: `{last_solved_test.test_name}`"
                     )
 
     else:
@@ -185,14 +374,8 @@ def compare_results(chat_id, contest_id, grouped_results):
 
     # Update history with the latest results
     updated_group_results = {
-        str(group): {
-            "last_solved_test": max(
-                (test for test in data["tests"] if test["result"].lower() == "ok"),
-                key=lambda x: x["test_name"],
-                default=None
-            )
-        }
-        for group, data in grouped_results.items()
+        str(group): {"last_solved_test": last_solved_test.to_dict() if last_solved_test else None}
+        for group, last_solved_test in last_solved_tests.items()
     }
 
     history[contest_id] = {
@@ -201,7 +384,7 @@ def compare_results(chat_id, contest_id, grouped_results):
         "group_results": updated_group_results,
         "timestamp": time.time(),
     }
-    save_submission_history(chat_id, history)  # Save submission history for the specific chat ID
+    save_submission_history(chat_id, contest_id, history[contest_id])  # Save submission history for the specific chat ID
 
     # Combine summary and group-specific changes
     comparison_message = "\n".join(summary)
@@ -229,24 +412,32 @@ def send_results_summary_to_telegram(chat_id, contest_id, grouped_results, resul
     telegram_bot.send_message(chat_id, summary_message)
 
 
-def load_submission_history(chat_id):
-    """Load historical submission data for a specific chat ID from a file."""
-    if os.path.exists(SUBMISSION_HISTORY_FILE):
-        with open(SUBMISSION_HISTORY_FILE, 'r') as f:
+def import_legacy_submission_history():
+    """Move the submission history from the former JSON file into the journal."""
+    with SUBMISSION_HISTORY_LOCK:
+        if not os.path.exists(LEGACY_SUBMISSION_HISTORY_FILE):
+            return
+
+        with open(LEGACY_SUBMISSION_HISTORY_FILE, 'r') as f:
             all_histories = json.load(f)
-        return all_histories.get(str(chat_id), {})
-    return {}
+        submission_history.update(
+            ((chat_id, contest_id), entry)
+            for chat_id, history in all_histories.items()
+            for contest_id, entry in history.items()
+        )
+        os.remove(LEGACY_SUBMISSION_HISTORY_FILE)
 
 
-def save_submission_history(chat_id, history):
-    """Save historical submission data for a specific chat ID to the file."""
-    if os.path.exists(SUBMISSION_HISTORY_FILE):
-        with open(SUBMISSION_HISTORY_FILE, 'r') as f:
-            all_histories = json.load(f)
-    else:
-        all_histories = {}
+def load_submission_history(chat_id):
+    """Load historical submission data for a specific chat ID, keyed by contest ID."""
+    import_legacy_submission_history()
+    return {
+        contest_id: entry
+        for (entry_chat_id, contest_id), entry in submission_history.items()
+        if entry_chat_id == str(chat_id)
+    }
 
-    all_histories[str(chat_id)] = history
 
-    with open(SUBMISSION_HISTORY_FILE, 'w') as f:
-        json.dump(all_histories, f, indent=4)
+def save_submission_history(chat_id, contest_id, entry):
+    """Save the latest submission data of a chat ID for one contest by appending it to the journal."""
+    submission_history.set((str(chat_id), contest_id), entry)
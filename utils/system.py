@@ -1,9 +1,178 @@
+import sys
+import hmac
+import time
+import asyncio
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from logging.handlers import MemoryHandler
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
 class ShutdownSignal:
+    """
+    Set once the bot is shutting down. Worker threads can wait on the event instead of sleeping,
+    so they return as soon as a shutdown is requested.
+    """
     flag = False
+    event = threading.Event()
+
+    @classmethod
+    def set(cls):
+        """Request a shutdown. Safe to call from signal handlers and other threads."""
+        cls.flag = True
+        cls.event.set()
+
+    @classmethod
+    def wait(cls, timeout):
+        """Sleep for up to timeout seconds. Returns True if a shutdown was requested in the meantime."""
+        return cls.event.wait(timeout)
+
+
+class WakeSignal:
+    """
+    Wakes up the CI task loop before CHECK_INTERVAL has passed, e.g. on SIGUSR1 or on shutdown.
+    """
+    loop = None
+    event = None
+
+    @classmethod
+    def attach(cls):
+        """Bind the wake-up event to the currently running event loop."""
+        cls.loop = asyncio.get_running_loop()
+        cls.event = asyncio.Event()
+
+    @classmethod
+    def set(cls):
+        """Wake up the CI task loop. Safe to call from signal handlers and other threads."""
+        if cls.loop is not None:
+            cls.loop.call_soon_threadsafe(cls.event.set)
+
+    @classmethod
+    async def wait(cls, timeout):
+        """Wait until the loop is woken up or the timeout has passed."""
+        try:
+            await asyncio.wait_for(cls.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        cls.event.clear()
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """
+    Accepts push notifications of the Git hosting service. The secret is expected in the `token` query
+    parameter or the `X-Gitlab-Token` header. Bodies larger than WEBHOOK_MAX_BODY_SIZE are refused unread.
+    """
+    def do_POST(self):
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            content_length = -1
+        if not 0 <= content_length <= Config.WEBHOOK_MAX_BODY_SIZE:
+            self.reject(413 if content_length > 0 else 400)
+            return
+
+        token = parse_qs(urlparse(self.path).query).get("token", [""])[0] or self.headers.get("X-Gitlab-Token", "")
+        if not hmac.compare_digest(token.encode(), Config.WEBHOOK_SECRET.encode()):
+            self.reject(403)
+            return
+
+        # The payload is not needed, the CI loop checks all repositories anyway
+        self.rfile.read(content_length)
+
+        WebhookServer.triggered = True
+        WakeSignal.set()
+        self.send_response(204)
+        self.end_headers()
+
+    def reject(self, status_code):
+        """Refuse the request without reading its body, and close the connection."""
+        self.close_connection = True
+        self.send_response(status_code)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.info(f"Webhook: {format % args}")
+
+
+class WebhookServer:
+    """
+    Optional HTTP endpoint (enabled by setting WEBHOOK_PORT and WEBHOOK_SECRET) for push webhooks.
+    Every accepted request wakes up the CI task loop, so new commits are picked up right away
+    instead of after up to CHECK_INTERVAL seconds.
+    While the endpoint is active, the remotes only need to be polled when a webhook arrives
+    and, as a fallback for missed webhooks, every WEBHOOK_FALLBACK_INTERVAL seconds.
+    """
+    server = None
+    triggered = False  # Set by every accepted webhook, cleared by the CI task loop
+
+    @classmethod
+    def start(cls):
+        """Start serving webhooks in a background thread, if configured."""
+        if not Config.WEBHOOK_PORT:
+            return
+        if not Config.WEBHOOK_SECRET:
+            logger.error("WEBHOOK_PORT is set, but WEBHOOK_SECRET is empty. The webhook endpoint is not started.")
+            return
+        cls.server = ThreadingHTTPServer((Config.WEBHOOK_HOST, Config.WEBHOOK_PORT), WebhookRequestHandler)
+        threading.Thread(target=cls.server.serve_forever, name="webhook", daemon=True).start()
+        logger.info(f"Listening for webhooks on {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}.")
+
+    @classmethod
+    def remotes_need_check(cls, last_check):
+        """
+        Whether the CI task loop has to poll the remotes, given the time.monotonic() of its last poll
+        (None if it has not polled yet). Consumes a pending webhook trigger.
+        """
+        triggered, cls.triggered = cls.triggered, False
+        if cls.server is None or triggered or last_check is None:
+            return True
+        return time.monotonic() - last_check >= Config.WEBHOOK_FALLBACK_INTERVAL
+
+    @classmethod
+    def stop(cls):
+        """Stop the webhook endpoint."""
+        if cls.server is not None:
+            cls.server.shutdown()
+            cls.server.server_close()
+            cls.server = None
+
+
+class LogBuffer:
+    """
+    Buffers log records of the CI tasks in memory and writes them out once per CI iteration,
+    instead of issuing a write to stdout for every message. Errors are written out immediately.
+    """
+    handler = None
+
+    @classmethod
+    def attach(cls):
+        """Route the log records of the bot's own modules through the buffer."""
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        cls.handler = MemoryHandler(Config.LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=stream_handler)
+        logging.basicConfig(handlers=[cls.handler])
+        for name in ("__main__", "api", "git_manager", "handlers", "utils"):
+            logging.getLogger(name).setLevel(logging.INFO)
+
+    @classmethod
+    def flush(cls):
+        """Write all buffered log records."""
+        if cls.handler is not None:
+            cls.handler.flush()
 
 
 def handle_shutdown_signal(signum, frame):
     """Signal handler to set the shutdown flag."""
-    global shutdown_flag
     print(f"\nSignal {signum} received. Shutting down gracefully...")
-    ShutdownSignal.flag = True
+    ShutdownSignal.set()
+    WakeSignal.set()
+
+
+def handle_wake_signal(signum, frame):
+    """Signal handler to trigger an immediate CI check."""
+    print(f"\nSignal {signum} received. Checking repositories now...")
+    WakeSignal.set()